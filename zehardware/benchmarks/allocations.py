@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+#
+# Measure what the main loop of ZeOs allocates per pass, running the real `ZeBadgeOs.step()` on
+# the simulated badge (see `simulator`): idle passes handling the TICK timer and the polling
+# tasks, and passes with a button pressed or released every few of them. Allocations of the fake
+# hardware modules are part of the numbers, the badge itself allocates less.
+#
+# As a baseline, the same badge also runs the loop ZeOs had before the message queue: all messages
+# copied into a new list with a new TICK message appended on every pass.
+#
+# Runs on the host: `python3 benchmarks/allocations.py` from the `zehardware` folder.
+#
+import contextlib
+import io
+import os
+import sys
+import tracemalloc
+
+ITERATIONS = 5000
+BUTTON_EVERY = 5
+
+# any device on the I2C bus, so the badge neither looks for a keyboard nor for wifi
+_OTHER_I2C_DEVICE = 0x20
+
+
+class Counter:
+    # counts every Message constructed, pooled ones are not
+    created = 0
+
+
+def _count_messages(message_module):
+    original = message_module.Message.__init__
+
+    def counting(self, *args, **kwargs):
+        Counter.created += 1
+        original(self, *args, **kwargs)
+
+    message_module.Message.__init__ = counting
+
+
+def idle(badge, iteration):
+    pass
+
+
+def buttons(badge, iteration):
+    # the app button of the running app: the input gets handled, without starting anything
+    if iteration % BUTTON_EVERY == 0:
+        if (iteration // BUTTON_EVERY) % 2:
+            badge.release('a')
+        else:
+            badge.press('a')
+
+
+def step(badge):
+    # every task due on every pass: the most a pass can do
+    badge.step(1, True)
+
+
+def legacy_step(badge):
+    # the loop before the message queue, running the tasks of today
+    import message
+    import zeos
+
+    os = badge.os
+    for task in os.tasks:
+        if task.name != f"timer:{zeos.MessageKey.TICK}":
+            task.function(os)
+
+    current_messages = []
+    for level in os.messages.take():
+        current_messages += level
+    current_messages += [message.Message(zeos.MessageKey.TICK, None)]
+
+    for current in current_messages:
+        for _, subscriber in os.subscribers.topics.get(current.topic, ()):
+            subscriber(os, current)
+
+    os.led_on = not os.led_on
+    os.led.value = os.led_on
+
+
+def measure(name, badge, scenario, run=step):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(10):
+            run(badge)
+
+        Counter.created = 0
+        peak = 0
+        allocated = 0
+        tracemalloc.start()
+        start, _ = tracemalloc.get_traced_memory()
+        for iteration in range(ITERATIONS):
+            scenario(badge, iteration)
+
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            run(badge)
+            current, highest = tracemalloc.get_traced_memory()
+
+            allocated += highest - before
+            peak = max(peak, highest - before)
+        end, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(
+        f"{name:>16}: {allocated / ITERATIONS:8.1f} bytes allocated per pass (at most {peak}), "
+        f"{(end - start) / ITERATIONS:5.1f} kept, "
+        f"{Counter.created / ITERATIONS:.2f} messages created per pass"
+    )
+
+
+def main():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from simulator import Badge
+
+    badge = Badge(i2c_devices=(_OTHER_I2C_DEVICE,))
+    with contextlib.redirect_stdout(io.StringIO()):
+        badge.boot()
+
+    import message
+    _count_messages(message)
+
+    measure("idle, before", badge, idle, legacy_step)
+    measure("idle", badge, idle)
+    measure("buttons, before", badge, buttons, legacy_step)
+    measure("buttons", badge, buttons)
+
+
+if __name__ == '__main__':
+    main()
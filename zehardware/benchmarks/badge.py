@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+#
+# Run the whole of ZeOs on the simulated badge (see `simulator`) and measure it end to end: boot,
+# decoding and showing a stored page, flipping through pages with and without the neighbours
+# prefetched, dispatching messages, uploads over the serial connection as text, frames and raw
+# binary, and the memory allocated per pass of the main loop.
+#
+# Runs on the host: `python3 benchmarks/badge.py` from the `zehardware` folder.
+#
+import base64
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+import zlib
+
+WIDTH = 296
+HEIGHT = 128
+ROUNDS = 10
+STEPS = 2000
+PAGES = 4
+
+# any device on the I2C bus, so the badge neither looks for a keyboard nor for wifi
+_OTHER_I2C_DEVICE = 0x20
+
+
+def _page(seed: int = 23) -> bytes:
+    # a deflated page of noise with some structure, like a dithered picture
+    random.seed(seed)
+    rows = []
+    for y in range(HEIGHT):
+        rows.append(bytes(random.getrandbits(8) & (0xF0 if y % 4 else 0xFF) for _ in range(WIDTH // 8)))
+    return zlib.compress(b''.join(rows))
+
+
+def _quiet(function, *args):
+    # the badge prints a lot, keep the results readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+def boot(Badge):
+    durations = []
+    for _ in range(ROUNDS):
+        badge = Badge(i2c_devices=(_OTHER_I2C_DEVICE,))
+        start = time.perf_counter()
+        _quiet(badge.boot)
+        durations.append(time.perf_counter() - start)
+
+    print(f"    boot: {min(durations) * 1000:8.1f}ms")
+    return badge
+
+
+def show_page(badge, page):
+    import ui
+
+    _quiet(ui.store_page, 'benchmark', base64.b64encode(page).decode())
+
+    def show(name):
+        decoding = []
+        showing = []
+        for _ in range(ROUNDS):
+            refreshes = len(badge.display.refreshes)
+            shown = badge.display.root_group
+            if name == 'uncached':
+                ui.invalidate_cached('benchmark')
+
+            start = time.perf_counter()
+            badge.os.messages.append(ui.Message(ui.MessageKey.SHOW_FILE, 'benchmark'))
+            while badge.display.root_group is shown:
+                _quiet(badge.step, 1, True)
+            decoded = time.perf_counter()
+            while len(badge.display.refreshes) == refreshes:
+                _quiet(badge.step, 1, True)
+
+            decoding.append(decoded - start)
+            showing.append(time.perf_counter() - start)
+
+        print(
+            f"    show: {min(decoding) * 1000:8.1f}ms to decode, {min(showing) * 1000:.1f}ms from SHOW_FILE "
+            f"to refresh, {name}"
+        )
+
+    show('uncached')
+    show('cached')
+
+
+def flip(badge):
+    import ui
+
+    names = [f'flip{index}' for index in range(PAGES)]
+    for index, name in enumerate(names):
+        _quiet(ui.store_page, name, base64.b64encode(_page(index)).decode())
+
+    app = badge.os.active_app
+
+    def measure(name, prefetched):
+        showing = []
+        refreshing = []
+        for _ in range(ROUNDS):
+            if prefetched:
+                # idle ticks until the neighbours of the shown page are decoded
+                while app._prefetching or app._prefetch_queue:
+                    _quiet(badge.step, 1, True)
+            else:
+                app._cancel_prefetch()
+                for page in ui.stored_pages():
+                    ui.invalidate_cached(page)
+
+            # the next page shows once the button is let go
+            badge.press('down')
+            _quiet(badge.step, 1, True)
+
+            refreshes = len(badge.display.refreshes)
+            shown = badge.display.root_group
+            start = time.perf_counter()
+            badge.release('down')
+            while badge.display.root_group is shown:
+                _quiet(badge.step, 1, True)
+            showing.append(time.perf_counter() - start)
+            while len(badge.display.refreshes) == refreshes:
+                _quiet(badge.step, 1, True)
+            refreshing.append(time.perf_counter() - start)
+
+        print(
+            f"    flip: {min(showing) * 1000:8.1f}ms to show the next page, {min(refreshing) * 1000:.1f}ms from "
+            f"letting go of 'down' to refresh, {name}"
+        )
+
+    measure('decoded on demand', False)
+    measure('prefetched', True)
+
+
+def dispatch(badge):
+    import message
+    import zeos
+
+    received = []
+    badge.os.subscribe('benchmark', lambda os, m: received.append(m.value))
+
+    start = time.perf_counter()
+    _quiet(badge.step, STEPS)
+    idle = (time.perf_counter() - start) / STEPS
+
+    start = time.perf_counter()
+    for step in range(STEPS):
+        badge.os.messages.append(message.obtain('benchmark', step))
+        badge.os.step()
+    busy = (time.perf_counter() - start) / STEPS
+
+    assert len(received) == STEPS
+    print(f"dispatch: {idle * 1000000:8.1f}us per idle pass of the main loop, {busy * 1000000:.1f}us with a message")
+    return zeos
+
+
+def upload(badge, page):
+    import frames
+
+    payload = base64.b64encode(page).decode()
+
+    def measure(name, send, size):
+        durations = []
+        for _ in range(ROUNDS):
+            refreshes = len(badge.display.refreshes)
+            badge.host_read()
+
+            start = time.perf_counter()
+            _quiet(send)
+            while len(badge.display.refreshes) == refreshes:
+                _quiet(badge.step, 1, True)
+            durations.append(time.perf_counter() - start)
+
+        duration = min(durations)
+        print(f"  upload: {duration * 1000:8.1f}ms, {size / duration / 1024:8.1f}kB/s as {name} ({size} bytes)")
+
+    def text():
+        # complete after the connection stayed quiet for a while, part of the cost of text
+        badge.host_write(f'preview::{payload}')
+        badge.step(1, True)
+        time.sleep(0.11)
+
+    def framed():
+        def read():
+            badge.step(1, True)
+            return badge.host_read()
+
+        frames.Sender(write=badge.host_write, read=read).send('preview', '', payload)
+
+    def binary():
+        badge.host_write(frames.encode_binary('preview', '', page))
+
+    measure('text', text, len(payload))
+    measure('frames', framed, len(payload))
+    measure('binary', binary, len(page))
+
+
+def allocations(badge):
+    _quiet(badge.step, 10, True)
+
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    peak = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(STEPS):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            badge.step(1, True)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"  memory: {(end - start) / STEPS:8.1f} bytes kept per pass running every task, "
+        f"at most {peak} bytes allocated during one"
+    )
+
+
+def main():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from simulator import Badge
+
+    page = _page()
+
+    badge = boot(Badge)
+    show_page(badge, page)
+    flip(badge)
+    dispatch(badge)
+    upload(badge, page)
+    allocations(badge)
+
+
+if __name__ == '__main__':
+    main()
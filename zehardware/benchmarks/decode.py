@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+#
+# Compare the old pixel by pixel bitmap unpacking with the row based one from `bits.py`.
+#
+# Runs on the host: `python3 benchmarks/decode.py` from the `zehardware` folder.
+#
+import os
+import random
+import sys
+import time
+
+WIDTH = 296
+HEIGHT = 128
+ROUNDS = 10
+
+
+def _install_fakes():
+    # the displayio and bitmaptools of the simulated badge, see `simulator`
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    import simulator
+    simulator.install()
+
+
+def legacy_unpack(bitmap, binarized_bytes, width, height):
+    # the loop `ui.decode_serialized_bitmap` used before
+    for y in range(height):
+        for x in range(width):
+            byte_index = (y * (width // 8)) + (x // 8)
+            bit_index = 7 - (x % 8)
+            pixel_value = (binarized_bytes[byte_index] >> bit_index) & 1
+            bitmap[x, y] = pixel_value
+
+
+def measure(name, unpack, data):
+    import displayio
+    bitmap = displayio.Bitmap(WIDTH, HEIGHT, 2)
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        unpack(bitmap, data, WIDTH, HEIGHT)
+    duration = (time.perf_counter() - start) / ROUNDS
+
+    print(f"{name:>8}: {duration * 1000:8.3f}ms per page")
+    return bitmap, duration
+
+
+def main():
+    _install_fakes()
+    import bits
+
+    data = bytes(random.getrandbits(8) for _ in range(WIDTH * HEIGHT // 8))
+
+    legacy_bitmap, legacy_duration = measure("legacy", legacy_unpack, data)
+    rows_bitmap, rows_duration = measure("rows", bits.unpack_into, data)
+
+    assert legacy_bitmap._pixels == rows_bitmap._pixels, "Unpacked pixels differ!"
+    print(f"identical output, {legacy_duration / rows_duration:.1f}x faster.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+#
+# Compare parsing http responses from the wifi module the old way (collect everything, decode,
+# strip the +IPD markers with a regex, split into lines) with `httpreader.HttpReader`, which
+# parses the bytes as they arrive from the UART. Reports time and peak memory per response.
+#
+# Runs on the host: `python3 benchmarks/responses.py` from the `zehardware` folder.
+#
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+ROUNDS = 20
+BODY_SIZES = (1024, 8 * 1024, 32 * 1024)
+
+# bytes the UART hands over in one read, and the most the module puts into one +IPD packet
+READ_SIZE = 256
+PACKET_SIZE = 1460
+
+
+def _response(size: int) -> bytes:
+    posts = []
+    while len(json.dumps(posts)) < size - 48:
+        posts.append({'message': f'post number {len(posts)}', 'profileB64': None})
+    body = json.dumps(posts).encode()
+
+    http = b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n' % len(body) + body
+    received = b'\r\nRecv 85 bytes\r\n\r\nSEND OK\r\n'
+    for offset in range(0, len(http), PACKET_SIZE):
+        packet = http[offset:offset + PACKET_SIZE]
+        received += b'\r\n+IPD,%d:' % len(packet) + packet
+    return received
+
+
+def _reads(received: bytes):
+    return [received[offset:offset + READ_SIZE] for offset in range(0, len(received), READ_SIZE)]
+
+
+def legacy_parse(reads):
+    # what `ZeWifi._parse_response` used to do, on everything received
+    response = b''
+    for data in reads:
+        response += data
+    response = response.decode()
+
+    response = re.sub(r'\+IPD,[0-9]+:', '', response)
+    start = response.find('HTTP/')
+    parts = response[start:].replace('\r\n', '\n').splitlines()
+
+    http_parts = parts
+    http_code, status_code = http_parts.pop(0).strip().split()[:2]
+    status_code = int(status_code)
+
+    headers = {}
+    header_separator_index = -1
+    for index, header in enumerate(http_parts):
+        if header == '':
+            header_separator_index = index
+            break
+
+        key, value = header.split(":", 1)
+        headers[key.strip()] = value.strip()
+
+    body = "".join(http_parts[header_separator_index:])
+    return status_code, headers, body
+
+
+def streaming_parse(reads):
+    import httpreader
+
+    reader = httpreader.HttpReader()
+    for data in reads:
+        reader.feed(data)
+
+    response = reader.response()
+    return response.status, response.headers, response.body
+
+
+def streamed_to_callback(reads):
+    import httpreader
+
+    received = [0]
+
+    def count(chunk):
+        received[0] += len(chunk)
+
+    reader = httpreader.HttpReader(count)
+    for data in reads:
+        reader.feed(data)
+
+    return reader.status, reader.headers, received[0]
+
+
+def measure(name, parse, reads):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = parse(reads)
+    duration = (time.perf_counter() - start) / ROUNDS
+
+    tracemalloc.start()
+    parse(reads)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:>10}: {duration * 1000:8.3f}ms, peak {peak:7d} bytes")
+    return result
+
+
+def main():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+    # imported once up front, not while measuring
+    import httpreader
+
+    for size in BODY_SIZES:
+        reads = _reads(_response(size))
+        print(f"about {size} bytes of body in {len(reads)} reads:")
+
+        legacy = measure("legacy", legacy_parse, reads)
+        streaming = measure("streaming", streaming_parse, reads)
+        callback = measure("callback", streamed_to_callback, reads)
+
+        assert legacy[0] == streaming[0] == callback[0] == 200
+        assert json.loads(streaming[2]) == json.loads(legacy[2])
+        assert callback[2] == len(streaming[2])
+
+
+if __name__ == '__main__':
+    main()
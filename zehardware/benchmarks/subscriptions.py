@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+# Compare the old nested dict subscriptions of ZeOs with `subscriptions.py`: many subscribers,
+# app switches (subscribe and unsubscribe a handful) and dispatching messages in between.
+#
+# Runs on the host: `python3 benchmarks/subscriptions.py` from the `zehardware` folder.
+#
+import os
+import sys
+import time
+
+TOPICS = 40
+SUBSCRIBERS_PER_TOPIC = 5
+APP_SUBSCRIPTIONS = 4
+SWITCHES = 5000
+MESSAGES_PER_SWITCH = 20
+
+
+class LegacySubscriptions:
+    # what `ZeBadgeOs.subscribe`, `unsubscribe` and `run` used to do
+
+    def __init__(self):
+        self.next_subscription_id = 0
+        self.subscribers = {}
+
+    def subscribe(self, topic, subscriber):
+        if topic not in self.subscribers:
+            self.subscribers[topic] = {}
+
+        subscription_id = self.next_subscription_id
+        self.next_subscription_id += 1
+
+        self.subscribers[topic][subscription_id] = subscriber
+        return subscription_id
+
+    def unsubscribe(self, subscription_id):
+        # iterate over a copy: deleting while iterating raises on the host
+        for topic in list(self.subscribers):
+            if subscription_id in self.subscribers[topic]:
+                del self.subscribers[topic][subscription_id]
+
+            if len(self.subscribers[topic]) == 0:
+                del self.subscribers[topic]
+
+    def dispatch(self, message):
+        if message in self.subscribers:
+            subscriber_ids = self.subscribers[message]
+            for subscriber_id in subscriber_ids:
+                subscriber_ids[subscriber_id](None, message)
+
+
+class IndexedSubscriptions:
+    # `subscriptions.Subscriptions`, dispatched the way `ZeBadgeOs.run` does
+
+    def __init__(self):
+        import subscriptions
+        self.subscribers = subscriptions.Subscriptions()
+        self.subscribe = self.subscribers.subscribe
+        self.unsubscribe = self.subscribers.unsubscribe
+
+    def dispatch(self, message):
+        index = self.subscribers.index
+        for subscriber_id, subscriber in self.subscribers.topics.get(message, ()):
+            if subscriber_id in index:
+                subscriber(None, message)
+
+
+def _handler(os, message):
+    pass
+
+
+def measure(name, registry):
+    for topic in range(TOPICS):
+        for _ in range(SUBSCRIBERS_PER_TOPIC):
+            registry.subscribe(topic, _handler)
+
+    switching = 0
+    dispatching = 0
+    app = []
+    for switch in range(SWITCHES):
+        start = time.perf_counter()
+        for subscription_id in app:
+            registry.unsubscribe(subscription_id)
+        app = [registry.subscribe((switch + index) % TOPICS, _handler) for index in range(APP_SUBSCRIPTIONS)]
+        switching += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for message in range(MESSAGES_PER_SWITCH):
+            registry.dispatch(message % TOPICS)
+        dispatching += time.perf_counter() - start
+
+    print(
+        f"{name:>8}: {switching * 1000:8.1f}ms for {SWITCHES} app switches, "
+        f"{dispatching * 1000:8.1f}ms for {SWITCHES * MESSAGES_PER_SWITCH} messages"
+    )
+    return switching, dispatching
+
+
+def main():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+    legacy = measure("legacy", LegacySubscriptions())
+    indexed = measure("indexed", IndexedSubscriptions())
+
+    print(f"app switches {legacy[0] / indexed[0]:.1f}x, dispatching {legacy[1] / indexed[1]:.1f}x faster.")
+
+
+if __name__ == '__main__':
+    main()
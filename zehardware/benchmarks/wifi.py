@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+#
+# Count what ZePass requests cost on the wifi module: a local http server stands in for the
+# ZePass server, the simulated ESP (`simulator.esp`) bridges the badge's UART to it. Compares
+# the old way (connect, check, send, close for every request) with keeping the connection open.
+#
+# Runs on the host: `python3 benchmarks/wifi.py` from the `zehardware` folder.
+#
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REQUESTS = 50
+POST_EVERY = 5
+
+# how long the module takes to answer every command, in seconds
+LATENCY = 0.005
+
+_POSTS = json.dumps([{'message': f'post number {index}', 'profileB64': None} for index in range(8)]).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        Handler.connections += 1
+        # headers and body get written separately, don't let them wait for the delayed ack
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(_POSTS)))
+        self.end_headers()
+        self.wfile.write(_POSTS)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def legacy_http(wifi_module, zewifi, method, ip, url, host="", port=80, body=""):
+    # what `ZeWifi._http_method` used to send for every request, as an operation
+    Command = wifi_module.Command
+    yield Command(f'AT+CIPSTART="TCP","{ip}",{port}\r\n', timeout=10.0)
+    yield Command('AT+CIPSTATUS\r\n')
+
+    payload = (f"{method} {url} HTTP/1.1\r\n" +
+               f"Host: {ip}:{port}\r\n" +
+               f"User-Agent: ZeBadge/0.1337.0\r\n" +
+               f"Accept: */*\r\n")
+    if len(body) > 0:
+        payload += (f"Content-type: application/json\r\n" +
+                    f"Content-Length: {len(body)}\r\n")
+    payload += f"\r\n{body}"
+
+    yield Command(f'AT+CIPSEND={len(payload)}\r\n', terminators=(wifi_module.PROMPT, wifi_module.ERROR))
+    yield Command(payload, terminators=(wifi_module.SEND_OK, wifi_module.ERROR))
+    reader = yield Command(None, terminators=(), timeout=10.0, reader=wifi_module.HttpReader())
+    yield Command('AT+CIPCLOSE\r\n')
+
+    return reader.response()
+
+
+def execute(zewifi, operation):
+    results = []
+    zewifi.submit(operation, results.append)
+    while not results:
+        zewifi.poll()
+        time.sleep(0.0005)
+    return results[0]
+
+
+def measure(name, esp, zewifi, http):
+    esp.commands.clear()
+    esp.connections = 0
+    Handler.connections = 0
+
+    start = time.perf_counter()
+    for index in range(REQUESTS):
+        if index % POST_EVERY == 0:
+            response = execute(zewifi, http('POST', '/posts', body='{"uuid": "1234"}'))
+            assert response and response.status == 201, response
+        else:
+            response = execute(zewifi, http('GET', '/posts'))
+            assert response and json.loads(response.body)[0]['message'] == 'post number 0', response
+    duration = time.perf_counter() - start
+
+    print(
+        f"{name:>10}: {len(esp.commands) / REQUESTS:.2f} AT commands, "
+        f"{Handler.connections / REQUESTS:.2f} tcp connections, "
+        f"{duration / REQUESTS * 1000:.1f}ms per request"
+    )
+    return len(esp.commands)
+
+
+def main():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    import simulator
+    simulator.install()
+    from simulator import hardware
+    from simulator.esp import FakeEsp
+    import wifi
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ip, port = server.server_address
+
+    hardware.reset()
+    esp = FakeEsp(networks=(('ZeWifi', 'de:ad:be:ef:00:01', -42),), password='secret', latency=LATENCY, bridge=True)
+    esp.attach()
+    esp.joined = 'ZeWifi'
+    zewifi = wifi.ZeWifi()
+
+    def legacy(method, url, body=''):
+        return legacy_http(wifi, zewifi, method, ip, url, 'zepass', port, body)
+
+    def keep_alive(method, url, body=''):
+        return zewifi._http_method(method, ip, url, 'zepass', port, body)
+
+    before = measure("legacy", esp, zewifi, legacy)
+    after = measure("keep-alive", esp, zewifi, keep_alive)
+    print(f"{before / after:.1f}x fewer round trips to the module.")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
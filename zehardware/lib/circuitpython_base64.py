@@ -46,7 +46,11 @@ __repo__ = "https://github.com/jimbobbennett/CircuitPython_base64.git"
 
 import re
 import struct
-import adafruit_binascii as binascii
+
+try:
+    import adafruit_binascii as binascii
+except ImportError:
+    import binascii
 
 
 __all__ = [
@@ -65,6 +69,9 @@ __all__ = [
     # Standard Base64 encoding
     "standard_b64encode",
     "standard_b64decode",
+    # Incremental Base64 decoding
+    "B64Decoder",
+    "B64Reader",
 ]
 
 
@@ -154,6 +161,110 @@ def standard_b64decode(todecode):
     return b64decode(todecode)
 
 
+# Incremental Base64 decoding, for payloads too big to be decoded in one go
+
+
+class B64Decoder:
+    """Decode Base64 incrementally.
+
+    Feed chunks of encoded data as they arrive, and read the decoded bytes
+    out with read() or readinto(). Chunks can be split anywhere; whitespace
+    (like line breaks) in between is ignored. Only whole groups of four
+    characters are decoded, the rest is kept for the next feed().
+
+    Call finish() after the last chunk: a ValueError is raised if there are
+    characters left over that do not form a complete group.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._decoded = bytearray()
+        self._offset = 0
+
+    def __len__(self):
+        """Amount of decoded bytes ready to be read."""
+        return len(self._decoded) - self._offset
+
+    def feed(self, data):
+        """Add a chunk of encoded data, return the amount of decoded bytes ready to be read."""
+        data = b"".join(_bytes_from_decode_data(data).split())
+        if self._pending:
+            data = self._pending + data
+
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+
+        if usable:
+            self._compact()
+            self._decoded += binascii.a2b_base64(data[:usable])
+
+        return len(self)
+
+    def finish(self):
+        """Signal the end of the encoded data, raises ValueError for left over characters."""
+        if self._pending:
+            pending = len(self._pending)
+            self._pending = b""
+            raise ValueError("Incorrect padding: %d characters left" % pending)
+
+    def read(self, size=-1):
+        """Return up to size decoded bytes, all of them if size is negative."""
+        available = len(self)
+        if size < 0 or size > available:
+            size = available
+
+        result = bytes(self._decoded[self._offset : self._offset + size])
+        self._offset += size
+        return result
+
+    def readinto(self, buffer):
+        """Copy decoded bytes into the given buffer, return how many were copied."""
+        size = min(len(buffer), len(self))
+        buffer[:size] = self._decoded[self._offset : self._offset + size]
+        self._offset += size
+        return size
+
+    def _compact(self):
+        # drop the bytes already read, before appending new ones
+        if self._offset:
+            self._decoded = self._decoded[self._offset :]
+            self._offset = 0
+
+
+class B64Reader:
+    """A stream of decoded bytes, reading Base64 from the given stream chunk by chunk.
+
+    Useful for chaining: B64Reader(file) can be handed to anything reading
+    binary streams, like a streaming zlib decompressor, without the whole
+    encoded or decoded payload ever being in memory.
+    """
+
+    def __init__(self, stream, chunk_size=512):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = B64Decoder()
+        self._exhausted = False
+
+    def _fill(self, size):
+        while not self._exhausted and (size < 0 or len(self.decoder) < size):
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                self._exhausted = True
+                self.decoder.finish()
+            else:
+                self.decoder.feed(chunk)
+
+    def read(self, size=-1):
+        """Return up to size decoded bytes, everything left if size is negative."""
+        self._fill(size)
+        return self.decoder.read(size)
+
+    def readinto(self, buffer):
+        """Decode into the given buffer, return how many bytes were written; 0 at the end."""
+        self._fill(len(buffer))
+        return self.decoder.readinto(buffer)
+
+
 # Base32 encoding/decoding must be done in Python
 BASE32_ALPHABET = {
     0: b"A",
@@ -415,3 +526,59 @@ def decodestring(todecode):
         "decodestring() is a deprecated alias, use decodebytes()", DeprecationWarning, 2
     )
     return decodebytes(todecode)
+
+
+def __test__():
+    # compare incremental decoding to CPython's base64, run on the host.
+    import base64 as reference
+    import io
+    import random
+
+    for _ in range(200):
+        raw = bytes(random.getrandbits(8) for _ in range(random.randint(0, 2000)))
+        encoded = reference.b64encode(raw)
+
+        # random chunk sizes, sometimes with a line break in between
+        decoder = B64Decoder()
+        decoded = b""
+        offset = 0
+        while offset < len(encoded):
+            size = random.randint(1, 97)
+            chunk = encoded[offset : offset + size]
+            if random.random() < 0.2:
+                chunk += b"\r\n"
+            offset += size
+
+            decoder.feed(chunk)
+            decoded += decoder.read(random.randint(0, 300))
+
+        decoder.finish()
+        decoded += decoder.read()
+        assert decoded == raw, "feed/read differs from base64"
+
+        # as a stream, into a buffer
+        reader = B64Reader(io.BytesIO(encoded), chunk_size=random.randint(1, 300))
+        buffer = bytearray(len(raw))
+        view = memoryview(buffer)
+        filled = 0
+        while filled < len(raw):
+            read = reader.readinto(view[filled : filled + random.randint(1, 500)])
+            assert read > 0, "reader ended early"
+            filled += read
+        assert buffer == raw, "readinto differs from base64"
+        assert reader.read() == b"", "reader has left overs"
+
+    truncated = B64Decoder()
+    truncated.feed(b"QUJD" + b"RA")
+    try:
+        truncated.finish()
+        assert False, "incomplete group not detected"
+    except ValueError:
+        pass
+
+    print("B64Decoder matches base64.")
+
+
+if __name__ == "__main__":
+    # run the tests to see if kaput
+    __test__()
@@ -0,0 +1,30 @@
+"""Runs ZeOs on the host: fake CircuitPython modules on top of simulated badge hardware.
+
+    from simulator import Badge
+
+    badge = Badge()
+    badge.boot()
+    badge.click('c')
+    badge.step()
+    print(badge.display.texts())
+
+`install()` puts the fakes, `src` and `lib` in front of `sys.path`, `Badge` does it on creation.
+"""
+import os
+import sys
+
+ZEHARDWARE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKES = os.path.join(ZEHARDWARE, 'simulator', 'fakes')
+SRC = os.path.join(ZEHARDWARE, 'src')
+LIB = os.path.join(ZEHARDWARE, 'lib')
+
+
+def install():
+    # the fakes shadow anything of the same name, then the badge code and its libraries
+    for path in reversed((FAKES, SRC, LIB, ZEHARDWARE)):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+
+
+from simulator.badge import Badge  # noqa: E402
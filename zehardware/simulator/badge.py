@@ -0,0 +1,180 @@
+"""A simulated badge: boots ZeOs in a folder standing in for its flash, presses its buttons and
+talks to it over the simulated USB serial connection."""
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+import simulator
+from simulator import hardware
+
+BUTTON_PINS = {
+    'a': 'SW_A',
+    'b': 'SW_B',
+    'c': 'SW_C',
+    'up': 'SW_UP',
+    'down': 'SW_DOWN',
+    'developer': 'USER_SW',
+}
+
+# address of the keyboard on the I2C bus
+KEYBOARD_ADDRESS = 95
+
+# images the apps expect on the flash that are not in `resources`: filename -> (width, height, pixel(x, y) -> white?)
+_IMAGES = {
+    'zeAlternative.bmp': (hardware.WIDTH, hardware.HEIGHT, lambda x, y: (x // 16) % 2),
+}
+
+# the bitmaps of `resources` zeflash copies onto the flash, used as they are
+RESOURCES = os.path.join(simulator.ZEHARDWARE, 'resources')
+
+
+class Badge:
+    def __init__(self, root: str = None, i2c_devices=(), refresh_interval: float = 0.0, read_only: bool = False):
+        simulator.install()
+        hardware.reset()
+
+        hardware.display.refresh_interval = refresh_interval
+        hardware.read_only = read_only
+        for address in i2c_devices:
+            hardware.i2c_devices[address] = hardware.I2CDevice(address)
+
+        self.root = root if root else tempfile.mkdtemp(prefix='zebadge-')
+        os.chdir(self.root)
+        for filename in os.listdir(RESOURCES):
+            if filename.endswith('.bmp') and not os.path.exists(filename):
+                shutil.copy(os.path.join(RESOURCES, filename), filename)
+
+        for filename, (width, height, pixel) in _IMAGES.items():
+            if not os.path.exists(filename):
+                write_bmp(filename, width, height, pixel)
+
+        self.os = None
+
+    @property
+    def display(self) -> hardware.Display:
+        return hardware.display
+
+    @property
+    def usb(self) -> hardware.Connection:
+        return hardware.usb
+
+    @property
+    def uart(self) -> hardware.Connection:
+        return hardware.uart
+
+    def boot(self):
+        # like a reset: every module of the badge gets imported again, with fresh globals
+        for name, module in list(sys.modules.items()):
+            if getattr(module, '__file__', None) and module.__file__.startswith(simulator.SRC):
+                del sys.modules[name]
+
+        import zeos
+        self._use_flash()
+        self.os = zeos.ZeBadgeOs()
+
+        # apps imported while booting
+        self._use_flash()
+        return self.os
+
+    def _use_flash(self):
+        # the badge code sees the folder of the badge as `/`, not the root of the host
+        flash = Flash(self.root)
+        for module in list(sys.modules.values()):
+            if getattr(module, '__file__', None) and module.__file__.startswith(simulator.SRC):
+                for name, value in list(vars(module).items()):
+                    if value is os:
+                        setattr(module, name, flash)
+
+    def step(self, count: int = 1, due: bool = False):
+        # one pass of the main loop per count, `due` runs every task regardless of its interval
+        for _ in range(count):
+            if due:
+                for task in self.os.tasks:
+                    task.deadline = 0
+
+            self.os.step()
+
+    def run_for(self, seconds: float):
+        # the main loop in real time, sleeping between tasks like on the badge
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            self.os.step()
+            if not self.os.messages:
+                self.os.sleep(end)
+
+    def press(self, button: str):
+        hardware.pins[BUTTON_PINS[button]].set(True)
+
+    def release(self, button: str):
+        hardware.pins[BUTTON_PINS[button]].set(False)
+
+    def click(self, button: str):
+        self.press(button)
+        self.release(button)
+
+    def host_write(self, data):
+        # bytes the host sends to the badge
+        hardware.usb.incoming.write(data)
+
+    def host_read(self) -> bytes:
+        # bytes the badge sent to the host since the last read
+        return hardware.usb.outgoing.read()
+
+    def send_command(self, command: str, meta: str = '', payload: str = '') -> bytes:
+        # a text command, stepped until the badge considers it complete and handled it
+        self.host_write(f'{command}:{meta}:{payload}')
+        self.step(due=True)
+        time.sleep(0.11)
+        # read, handle and send the response
+        self.step(3, due=True)
+        return self.host_read()
+
+
+class Flash:
+    """The `os` module as the badge code sees it: absolute paths are inside the folder of the badge."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, path: str) -> str:
+        return os.path.join(self.root, path.lstrip('/')) if path.startswith('/') else path
+
+    def listdir(self, path: str = '.'):
+        return os.listdir(self.path(path))
+
+    def stat(self, path: str):
+        return os.stat(self.path(path))
+
+    def remove(self, path: str):
+        os.remove(self.path(path))
+
+    def rename(self, source: str, destination: str):
+        os.rename(self.path(source), self.path(destination))
+
+    def mkdir(self, path: str):
+        os.mkdir(self.path(path))
+
+    def __getattr__(self, name):
+        return getattr(os, name)
+
+
+def write_bmp(filename: str, width: int, height: int, pixel):
+    # a 1 bit, black and white bmp
+    stride = ((width + 31) // 32) * 4
+    rows = bytearray()
+    for y in reversed(range(height)):
+        row = bytearray(stride)
+        for x in range(width):
+            if pixel(x, y):
+                row[x // 8] |= 0x80 >> (x % 8)
+        rows += row
+
+    offset = 14 + 40 + 2 * 4
+    with open(filename, 'wb') as file:
+        file.write(struct.pack('<2sIHHI', b'BM', offset + len(rows), 0, 0, offset))
+        file.write(struct.pack('<IiiHHIIiiII', 40, width, height, 1, 1, 0, len(rows), 2835, 2835, 2, 2))
+        file.write(struct.pack('<II', 0x000000, 0xFFFFFF))
+        file.write(rows)
@@ -0,0 +1,202 @@
+"""A scripted ESP8266 speaking AT commands on the UART of the simulated badge, like the ZeWifi module.
+
+    esp = FakeEsp(networks=(('ZeWifi', 'de:ad:be:ef:00:01', -42),), password='secret')
+    esp.servers[('10.0.0.2', 80)] = lambda request: b'HTTP/1.1 200 OK\\r\\nContent-Length: 2\\r\\n\\r\\nhi'
+    esp.attach()
+
+Servers get the raw request and return the raw response. With `bridge` set, connections to
+addresses without a server go to real tcp sockets on the host instead. Every answer arrives
+`latency` seconds after the command, scans take `scan_duration` seconds on top.
+"""
+import socket
+import time
+
+from simulator import hardware
+
+_OK = b'\r\nOK\r\n'
+_ERROR = b'\r\nERROR\r\n'
+_FAIL = b'\r\nFAIL\r\n'
+
+# the most the module passes on in one +IPD packet
+_IPD_SIZE = 1460
+
+
+class FakeEsp:
+    def __init__(self, networks=(), password: str = None, latency: float = 0.0, scan_duration: float = 0.0,
+                 bridge: bool = False):
+        # (ssid, mac, strength)
+        self.networks = list(networks)
+        self.password = password
+        self.latency = latency
+        self.scan_duration = scan_duration
+        self.bridge = bridge
+
+        # (ip, port) -> function(request bytes) -> response bytes
+        self.servers = {}
+
+        # every command received, and how many tcp connections got opened
+        self.commands = []
+        self.connections = 0
+
+        self.joined = None
+        self.link = None
+        self._socket = None
+
+        self._line = b''
+        self._sending = 0
+        self._request = b''
+        self._pending = []
+
+    def attach(self, connection: hardware.Connection = None):
+        connection = connection if connection else hardware.uart
+        connection.responder = self
+        connection.source = self.arrived
+
+    def arrived(self) -> bytes:
+        if self._socket:
+            self._receive()
+
+        # answers due by now
+        now = time.monotonic()
+        due = b''
+        while self._pending and self._pending[0][0] <= now:
+            due += self._pending.pop(0)[1]
+        return due
+
+    def _answer(self, data: bytes, delay: float = 0.0):
+        due = time.monotonic() + self.latency + delay
+        if self._pending:
+            due = max(due, self._pending[-1][0])
+        self._pending.append((due, data))
+
+    def __call__(self, data: bytes):
+        for index in range(len(data)):
+            if self._sending:
+                self._request += data[index:index + 1]
+                self._sending -= 1
+                if not self._sending:
+                    self._send(self._request)
+                    self._request = b''
+                continue
+
+            self._line += data[index:index + 1]
+            if self._line.endswith(b'\r\n'):
+                line = self._line[:-2].decode()
+                self._line = b''
+                if line:
+                    self.commands.append(line)
+                    self._command(line)
+
+        return None
+
+    def _command(self, line: str):
+        name, _, arguments = line.partition('=')
+        arguments = [argument.strip('"') for argument in arguments.split(',')] if arguments else []
+
+        if name in ('AT', 'ATE0', 'ATE1', 'AT+CWMODE_CUR', 'AT+CIPMODE'):
+            self._answer(_OK)
+        elif name == 'AT+CWLAP':
+            found = b''.join(
+                f'+CWLAP:(3,"{ssid}",{strength},"{mac}",1)\r\n'.encode()
+                for ssid, mac, strength in self.networks
+            )
+            self._answer(found + _OK, self.scan_duration)
+        elif name == 'AT+CWJAP?':
+            if self.joined:
+                mac = next(network[1] for network in self.networks if network[0] == self.joined)
+                self._answer(f'+CWJAP:"{self.joined}","{mac}",6,-42\r\n'.encode() + _OK)
+            else:
+                self._answer(b'No AP\r\n' + _OK)
+        elif name == 'AT+CIPSTA?':
+            ip = '192.168.4.2' if self.joined else '0.0.0.0'
+            self._answer(f'+CIPSTA:ip:"{ip}"\r\n+CIPSTA:gateway:"192.168.4.1"\r\n'.encode() + _OK)
+        elif name == 'AT+CWJAP_CUR' or name == 'AT+CWJAP':
+            ssid, password = arguments[0], arguments[1]
+            if any(network[0] == ssid for network in self.networks) and password == self.password:
+                self.joined = ssid
+                self._answer(b'WIFI CONNECTED\r\nWIFI GOT IP\r\n' + _OK)
+            else:
+                self.joined = None
+                self._answer(b'+CWJAP:1\r\n' + _FAIL)
+        elif name == 'AT+CIPSTART':
+            address = (arguments[1], int(arguments[2]))
+            if self.link:
+                self._answer(b'ALREADY CONNECTED\r\n' + _ERROR)
+            elif not self.joined:
+                self._answer(b'no ip\r\n' + _ERROR)
+            elif address in self.servers or (self.bridge and self._connect(address)):
+                self.link = address
+                self.connections += 1
+                self._answer(b'CONNECT\r\n' + _OK)
+            else:
+                self._answer(_ERROR + b'CLOSED\r\n')
+        elif name == 'AT+CIPSEND':
+            if self.link:
+                self._sending = int(arguments[0])
+                self._answer(_OK + b'> ')
+            else:
+                self._answer(b'link is not valid\r\n' + _ERROR)
+        elif name == 'AT+CIPCLOSE':
+            if self.link:
+                self._disconnect()
+                self._answer(b'CLOSED\r\n' + _OK)
+            else:
+                self._answer(_ERROR)
+        elif name == 'AT+CIPSTATUS':
+            status = 3 if self.link else (2 if self.joined else 5)
+            self._answer(f'STATUS:{status}\r\n'.encode() + _OK)
+        else:
+            self._answer(_ERROR)
+
+    def drop(self):
+        # the access point went away
+        self.joined = None
+        if self.link:
+            self._disconnect()
+            self._answer(b'CLOSED\r\n')
+        self._answer(b'WIFI DISCONNECT\r\n')
+
+    def _send(self, request: bytes):
+        self._answer(f'\r\nRecv {len(request)} bytes\r\n\r\nSEND OK\r\n'.encode())
+
+        if self._socket:
+            # the answer arrives whenever the server sends it
+            self._socket.sendall(request)
+            return
+
+        response = self.servers[self.link](request)
+        if response:
+            self._answer(f'\r\n+IPD,{len(response)}:'.encode() + response)
+
+        if not response or b'Connection: close' in response:
+            self._disconnect()
+            self._answer(b'CLOSED\r\n')
+
+    def _connect(self, address) -> bool:
+        try:
+            self._socket = socket.create_connection(address, timeout=1.0)
+        except OSError:
+            return False
+
+        self._socket.setblocking(False)
+        return True
+
+    def _receive(self):
+        try:
+            data = self._socket.recv(_IPD_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+
+        if data:
+            self._answer(f'\r\n+IPD,{len(data)}:'.encode() + data)
+        else:
+            self._disconnect()
+            self._answer(b'CLOSED\r\n')
+
+    def _disconnect(self):
+        self.link = None
+        if self._socket:
+            self._socket.close()
+            self._socket = None
@@ -0,0 +1 @@
+# the labels of the simulated badge: the text gets remembered, only the background gets drawn.
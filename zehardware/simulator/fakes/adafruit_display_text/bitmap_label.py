@@ -0,0 +1 @@
+from adafruit_display_text.label import Label
@@ -0,0 +1,46 @@
+import displayio
+
+_GLYPH_WIDTH = 6
+_GLYPH_HEIGHT = 12
+
+
+class Label(displayio.Group):
+    def __init__(self, font=None, *, text='', color=0xFFFFFF, background_color=None, scale=1,
+                 anchor_point=None, anchored_position=None, x=0, y=0, **kwargs):
+        super().__init__(scale=scale, x=x, y=y)
+        self.font = font
+        self.text = text
+        self.color = color
+        self.background_color = background_color
+        self.anchor_point = anchor_point
+        self.anchored_position = anchored_position
+
+    def _size(self):
+        lines = self.text.split('\n')
+        width = max(len(line) for line in lines) * _GLYPH_WIDTH * self.scale
+        height = len(lines) * _GLYPH_HEIGHT * self.scale
+        return width, height
+
+    def _render(self, display, offset_x, offset_y):
+        if self.hidden or self.background_color is None or not self.text:
+            return
+
+        width, height = self._size()
+        if self.anchored_position is not None and self.anchor_point is not None:
+            left = self.anchored_position[0] - int(self.anchor_point[0] * width)
+            top = self.anchored_position[1] - int(self.anchor_point[1] * height)
+        else:
+            # x is the left edge, y the middle of the first line
+            left = self.x
+            top = self.y - _GLYPH_HEIGHT * self.scale // 2
+
+        shade = displayio._white(self.background_color)
+        for y in range(max(0, offset_y + top), min(display.height, offset_y + top + height)):
+            start = max(0, offset_x + left)
+            end = min(display.width, offset_x + left + width)
+            if end > start:
+                display.framebuffer[y * display.width + start:y * display.width + end] = bytes((shade,)) * (end - start)
+
+    def _texts(self, found):
+        if not self.hidden:
+            found.append(self.text)
@@ -0,0 +1,18 @@
+# the one bitmaptools function ZeOs uses, on top of the simulated `displayio.Bitmap`.
+
+
+def arrayblit(bitmap, data, x1=0, y1=0, x2=None, y2=None, skip_index=None):
+    x2 = bitmap.width if x2 is None else x2
+    y2 = bitmap.height if y2 is None else y2
+    width = x2 - x1
+
+    offset = 0
+    for y in range(y1, y2):
+        row = y * bitmap.width
+        if skip_index is None:
+            bitmap._pixels[row + x1:row + x2] = bytes(data[offset:offset + width])
+        else:
+            for x in range(width):
+                if data[offset + x] != skip_index:
+                    bitmap._pixels[row + x1 + x] = data[offset + x]
+        offset += width
@@ -0,0 +1,26 @@
+# board of the simulated Badger 2040: pins, display and I2C come from `simulator.hardware`.
+from simulator import hardware
+
+import busio
+
+board_id = 'pimoroni_badger2040'
+
+SW_A = hardware.pins['SW_A']
+SW_B = hardware.pins['SW_B']
+SW_C = hardware.pins['SW_C']
+SW_UP = hardware.pins['SW_UP']
+SW_DOWN = hardware.pins['SW_DOWN']
+USER_SW = hardware.pins['USER_SW']
+USER_LED = hardware.pins['USER_LED']
+SCL = hardware.pins['SCL']
+SDA = hardware.pins['SDA']
+TX = hardware.pins['TX']
+RX = hardware.pins['RX']
+VBAT_SENSE = hardware.pins['VBAT_SENSE']
+ENABLE_DIO = hardware.pins['ENABLE_DIO']
+
+DISPLAY = hardware.display
+
+
+def I2C():
+    return busio.I2C(SCL, SDA)
@@ -0,0 +1,72 @@
+# UART and I2C of the simulated badge, backed by `simulator.hardware`.
+from simulator import hardware
+
+
+class UART:
+    # reads never block: what the other end has not answered yet is simply not there
+
+    def __init__(self, tx, rx, *, baudrate=9600, bits=8, parity=None, stop=1, timeout=1,
+                 receiver_buffer_size=64):
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.receiver_buffer_size = receiver_buffer_size
+
+    @property
+    def in_waiting(self):
+        return len(hardware.uart.receive())
+
+    def read(self, nbytes=None):
+        data = hardware.uart.receive().read(nbytes if nbytes is not None else -1)
+        return data if data else None
+
+    def readinto(self, buf):
+        read = hardware.uart.receive().readinto(buf)
+        return read if read else None
+
+    def readline(self):
+        incoming = hardware.uart.receive()
+        end = incoming.buffer.find(b'\n')
+        data = incoming.read(end + 1 if end >= 0 else -1)
+        return data if data else None
+
+    def write(self, buf):
+        return hardware.uart.badge_write(bytes(buf) if not isinstance(buf, str) else buf)
+
+    def reset_input_buffer(self):
+        hardware.uart.incoming.clear()
+
+    def deinit(self):
+        pass
+
+
+class I2C:
+    def __init__(self, scl, sda, *, frequency=100000, timeout=255):
+        self._locked = False
+
+    def try_lock(self):
+        if self._locked:
+            return False
+
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def scan(self):
+        return sorted(hardware.i2c_devices)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        if address not in hardware.i2c_devices:
+            raise OSError(19)
+
+        end = len(buffer) if end is None else end
+        data = hardware.i2c_devices[address].read(end - start)
+        buffer[start:start + len(data)] = data
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        if address not in hardware.i2c_devices:
+            raise OSError(19)
+
+    def deinit(self):
+        pass
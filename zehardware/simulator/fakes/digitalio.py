@@ -0,0 +1,42 @@
+# digital pins of the simulated badge, reading and writing `simulator.hardware.Pin`s.
+
+
+class Direction:
+    INPUT = 'input'
+    OUTPUT = 'output'
+
+
+class Pull:
+    UP = 'up'
+    DOWN = 'down'
+
+
+class DriveMode:
+    PUSH_PULL = 'push_pull'
+    OPEN_DRAIN = 'open_drain'
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+
+    @property
+    def value(self):
+        return self.pin.value
+
+    @value.setter
+    def value(self, value):
+        self.pin.set(bool(value))
+
+    def switch_to_output(self, value=False, drive_mode=DriveMode.PUSH_PULL):
+        self.direction = Direction.OUTPUT
+        self.value = value
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    def deinit(self):
+        pass
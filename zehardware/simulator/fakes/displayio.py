@@ -0,0 +1,296 @@
+# displayio of the simulated badge: bitmaps, palettes, tile grids and groups that render
+# themselves into the framebuffer of `simulator.hardware.Display`.
+import struct
+
+
+def _white(color) -> int:
+    # the panel only knows black and white: anything bright enough is white
+    if color is None:
+        return None
+
+    if isinstance(color, (bytes, bytearray)):
+        red, green, blue = color[0], color[1], color[2]
+    else:
+        red, green, blue = (color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF
+
+    return 1 if red + green + blue >= 384 else 0
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self._pixels = bytearray(width * height)
+
+    def _index(self, index):
+        if isinstance(index, tuple):
+            x, y = index
+            return y * self.width + x
+        return index
+
+    def __getitem__(self, index):
+        return self._pixels[self._index(index)]
+
+    def __setitem__(self, index, value):
+        self._pixels[self._index(index)] = value
+
+    def __len__(self):
+        return len(self._pixels)
+
+    def fill(self, value):
+        self._pixels[:] = bytes((value,)) * len(self._pixels)
+
+    def blit(self, x, y, source, *, x1=0, y1=0, x2=None, y2=None, skip_index=None):
+        x2 = source.width if x2 is None else x2
+        y2 = source.height if y2 is None else y2
+        for source_y in range(y1, y2):
+            for source_x in range(x1, x2):
+                value = source[source_x, source_y]
+                if value != skip_index:
+                    self[x + source_x - x1, y + source_y - y1] = value
+
+
+class Palette:
+    def __init__(self, color_count, *, dither=False):
+        self._colors = [0] * color_count
+        self._transparent = [False] * color_count
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, color):
+        if isinstance(color, (bytes, bytearray)):
+            color = (color[0] << 16) | (color[1] << 8) | color[2]
+        self._colors[index] = color
+
+    def make_transparent(self, index):
+        self._transparent[index] = True
+
+    def make_opaque(self, index):
+        self._transparent[index] = False
+
+    def is_transparent(self, index):
+        return self._transparent[index]
+
+    def _shades(self):
+        # value in the bitmap -> 1 white, 0 black, None transparent
+        return [None if transparent else _white(color) for color, transparent in zip(self._colors, self._transparent)]
+
+
+class ColorConverter:
+    def __init__(self, *, input_colorspace=None, dither=False):
+        self._transparent = None
+
+    def convert(self, color):
+        return color
+
+    def make_transparent(self, color):
+        self._transparent = color
+
+    def make_opaque(self, color):
+        self._transparent = None
+
+
+class OnDiskBitmap:
+    # reads the whole file at once, indexed bitmaps keep their palette, everything else
+    # gets reduced to black and white.
+
+    def __init__(self, file):
+        if isinstance(file, str):
+            with open(file, 'rb') as opened:
+                data = opened.read()
+        else:
+            data = file.read()
+
+        if data[:2] != b'BM':
+            raise ValueError("Invalid BMP file")
+
+        pixel_offset, = struct.unpack_from('<I', data, 10)
+        header_size, width, height, _, depth, compression = struct.unpack_from('<IiiHHI', data, 14)
+        colors_used, = struct.unpack_from('<I', data, 46) if header_size >= 40 else (0,)
+        if compression not in (0, 3):
+            raise NotImplementedError("compressed BMP")
+
+        top_down = height < 0
+        height = abs(height)
+        stride = ((depth * width + 31) // 32) * 4
+
+        self.width = width
+        self.height = height
+        self._pixels = bytearray(width * height)
+
+        if depth <= 8:
+            count = colors_used or (1 << depth)
+            palette = Palette(count)
+            table = 14 + header_size
+            for index in range(count):
+                blue, green, red = data[table + index * 4:table + index * 4 + 3]
+                palette[index] = (red << 16) | (green << 8) | blue
+        else:
+            palette = Palette(2)
+            palette[0] = 0x000000
+            palette[1] = 0xFFFFFF
+
+        per_byte = 8 // depth if depth <= 8 else 0
+        mask = (1 << depth) - 1 if depth <= 8 else 0
+        for y in range(height):
+            row = data[pixel_offset + (y if top_down else height - 1 - y) * stride:][:stride]
+            target = y * width
+            for x in range(width):
+                if per_byte:
+                    bit = x * depth
+                    value = (row[bit // 8] >> (8 - depth - bit % 8)) & mask
+                else:
+                    offset = x * (depth // 8)
+                    blue, green, red = row[offset:offset + 3]
+                    value = _white((red << 16) | (green << 8) | blue)
+                self._pixels[target + x] = value
+
+        self.pixel_shader = palette
+
+    def __getitem__(self, index):
+        x, y = index
+        return self._pixels[y * self.width + x]
+
+
+class TileGrid:
+    def __init__(self, bitmap, *, pixel_shader, width=1, height=1, tile_width=None, tile_height=None,
+                 default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.width = width
+        self.height = height
+        self.tile_width = bitmap.width if tile_width is None else tile_width
+        self.tile_height = bitmap.height if tile_height is None else tile_height
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self.flip_x = False
+        self.flip_y = False
+        self._tiles = bytearray((default_tile,)) * (width * height)
+
+    def _index(self, index):
+        if isinstance(index, tuple):
+            x, y = index
+            return y * self.width + x
+        return index
+
+    def __getitem__(self, index):
+        return self._tiles[self._index(index)]
+
+    def __setitem__(self, index, tile):
+        self._tiles[self._index(index)] = tile
+
+    def _render(self, display, offset_x, offset_y):
+        if self.hidden:
+            return
+
+        if isinstance(self.pixel_shader, Palette):
+            shades = self.pixel_shader._shades()
+        else:
+            shades = None
+
+        bitmap = self.bitmap
+        pixels = bitmap._pixels
+        framebuffer = display.framebuffer
+        tiles_per_row = bitmap.width // self.tile_width
+        left = offset_x + self.x
+        top = offset_y + self.y
+
+        for tile_y in range(self.height):
+            for tile_x in range(self.width):
+                tile = self._tiles[tile_y * self.width + tile_x]
+                source_x = (tile % tiles_per_row) * self.tile_width
+                source_y = (tile // tiles_per_row) * self.tile_height
+
+                for y in range(self.tile_height):
+                    screen_y = top + tile_y * self.tile_height + y
+                    if not 0 <= screen_y < display.height:
+                        continue
+
+                    source = (source_y + y) * bitmap.width + source_x
+                    target = screen_y * display.width
+                    for x in range(self.tile_width):
+                        screen_x = left + tile_x * self.tile_width + x
+                        if not 0 <= screen_x < display.width:
+                            continue
+
+                        value = pixels[source + x]
+                        shade = shades[value] if shades is not None else _white(value)
+                        if shade is not None:
+                            framebuffer[target + screen_x] = shade
+
+    def _texts(self, found):
+        pass
+
+
+class Group:
+    # scale is remembered, but not applied when rendering
+
+    def __init__(self, *, scale=1, x=0, y=0):
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._children = []
+
+    def __len__(self):
+        return len(self._children)
+
+    def __getitem__(self, index):
+        return self._children[index]
+
+    def __setitem__(self, index, layer):
+        self._children[index] = layer
+
+    def __delitem__(self, index):
+        del self._children[index]
+
+    def __contains__(self, layer):
+        return layer in self._children
+
+    def __iter__(self):
+        return iter(self._children)
+
+    def append(self, layer):
+        self._children.append(layer)
+
+    def insert(self, index, layer):
+        self._children.insert(index, layer)
+
+    def index(self, layer):
+        return self._children.index(layer)
+
+    def pop(self, index=-1):
+        return self._children.pop(index)
+
+    def remove(self, layer):
+        self._children.remove(layer)
+
+    def sort(self, key=None, reverse=False):
+        self._children.sort(key=key, reverse=reverse)
+
+    def _render(self, display, offset_x, offset_y):
+        if self.hidden:
+            return
+
+        for child in self._children:
+            child._render(display, offset_x + self.x, offset_y + self.y)
+
+    def _texts(self, found):
+        if self.hidden:
+            return
+
+        for child in self._children:
+            child._texts(found)
+
+
+CIRCUITPYTHON_TERMINAL = Group()
+
+
+def release_displays():
+    pass
@@ -0,0 +1,78 @@
+# keypad of the simulated badge: pressing a `simulator.hardware.Pin` queues an event right away.
+from simulator import hardware
+
+
+class Event:
+    def __init__(self, key_number=0, pressed=True, timestamp=None):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = hardware.ticks_ms() if timestamp is None else timestamp
+
+    @property
+    def released(self):
+        return not self.pressed
+
+    def __eq__(self, other):
+        return self.key_number == other.key_number and self.pressed == other.pressed
+
+    def __repr__(self):
+        return f"<Event: key_number {self.key_number} {'pressed' if self.pressed else 'released'}>"
+
+
+class EventQueue:
+    def __init__(self, max_events):
+        self.max_events = max_events
+        self.overflowed = False
+        self._events = []
+
+    def __len__(self):
+        return len(self._events)
+
+    def __bool__(self):
+        return bool(self._events)
+
+    def _put(self, key_number, pressed):
+        if len(self._events) >= self.max_events:
+            self.overflowed = True
+            return
+
+        self._events.append((key_number, pressed, hardware.ticks_ms()))
+
+    def get(self):
+        if not self._events:
+            return None
+
+        return Event(*self._events.pop(0))
+
+    def get_into(self, event):
+        if not self._events:
+            return False
+
+        event.key_number, event.pressed, event.timestamp = self._events.pop(0)
+        return True
+
+    def clear(self):
+        self._events.clear()
+        self.overflowed = False
+
+
+class Keys:
+    def __init__(self, pins, *, value_when_pressed, pull=True, interval=0.02, max_events=64):
+        self.key_count = len(pins)
+        self.events = EventQueue(max_events)
+
+        self._pins = tuple(pins)
+        self._value_when_pressed = value_when_pressed
+        for pin in self._pins:
+            pin.listeners.append(self._changed)
+
+    def _changed(self, pin, value):
+        self.events._put(self._pins.index(pin), value == self._value_when_pressed)
+
+    def reset(self):
+        self.events.clear()
+
+    def deinit(self):
+        for pin in self._pins:
+            if self._changed in pin.listeners:
+                pin.listeners.remove(self._changed)
@@ -0,0 +1,11 @@
+# the raw GPIOs of the simulated RP2040, the ones the wifi module is wired to.
+from simulator import hardware
+
+
+class pin:
+    GPIO4 = hardware.pins['SDA']
+    GPIO5 = hardware.pins['SCL']
+
+
+def reset():
+    raise SystemExit("microcontroller.reset()")
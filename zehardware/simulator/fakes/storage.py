@@ -0,0 +1,16 @@
+# the filesystem of the simulated badge is the current directory, read only if `hardware.read_only`.
+from simulator import hardware
+
+
+class _Mount:
+    @property
+    def readonly(self):
+        return hardware.read_only
+
+
+def getmount(path):
+    return _Mount()
+
+
+def remount(path, readonly=False, *, disable_concurrent_write_protection=False):
+    hardware.read_only = readonly
@@ -0,0 +1,23 @@
+# supervisor of the simulated badge: always connected over USB.
+from simulator import hardware
+
+
+class _Runtime:
+    usb_connected = True
+    serial_connected = True
+
+    @property
+    def serial_bytes_available(self):
+        return len(hardware.usb.incoming)
+
+
+runtime = _Runtime()
+
+
+def ticks_ms():
+    return hardware.ticks_ms()
+
+
+def reload():
+    # the badge restarts its code, the simulation stops
+    raise SystemExit("supervisor.reload()")
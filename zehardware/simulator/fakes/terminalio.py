@@ -0,0 +1,9 @@
+# the built in font of the simulated badge: only its size matters.
+
+
+class _Font:
+    def get_bounding_box(self):
+        return 6, 12
+
+
+FONT = _Font()
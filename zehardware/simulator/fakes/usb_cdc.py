@@ -0,0 +1,49 @@
+# the USB data channel of the simulated badge, backed by `simulator.hardware.usb`.
+from simulator import hardware
+
+
+class Serial:
+    # reads never block: bytes not sent by the host yet are simply not there
+
+    def __init__(self):
+        self.timeout = 1.0
+        self.write_timeout = None
+        self.connected = True
+
+    @property
+    def in_waiting(self):
+        return len(hardware.usb.receive())
+
+    def read(self, size=None):
+        return hardware.usb.receive().read(size if size is not None else -1)
+
+    def readinto(self, buf):
+        return hardware.usb.receive().readinto(buf)
+
+    def readline(self, size=-1):
+        incoming = hardware.usb.receive()
+        end = incoming.buffer.find(b'\n')
+        if end >= 0 and (size < 0 or end < size):
+            size = end + 1
+        return incoming.read(size)
+
+    def write(self, buf):
+        # like on the badge, str works as a buffer too
+        return hardware.usb.badge_write(buf if isinstance(buf, str) else bytes(buf))
+
+    def reset_input_buffer(self):
+        hardware.usb.incoming.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+
+console = None
+data = Serial()
+
+
+def enable(*, console=True, data=False):
+    pass
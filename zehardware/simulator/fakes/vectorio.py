@@ -0,0 +1,27 @@
+# shapes of the simulated badge: accepted, but not drawn.
+
+
+class _Shape:
+    def __init__(self, *, pixel_shader=None, x=0, y=0, **kwargs):
+        self.pixel_shader = pixel_shader
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+    def _render(self, display, x, y):
+        pass
+
+    def _texts(self, found):
+        pass
+
+
+class Circle(_Shape):
+    pass
+
+
+class Rectangle(_Shape):
+    pass
+
+
+class Polygon(_Shape):
+    pass
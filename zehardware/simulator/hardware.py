@@ -0,0 +1,218 @@
+"""The simulated hardware behind the fake CircuitPython modules: pins, byte pipes and the display.
+
+The fakes in `simulator/fakes` only forward to the objects here, so a test or benchmark can
+reach all of them through one place (see `simulator.badge.Badge`).
+"""
+import time
+
+WIDTH = 296
+HEIGHT = 128
+
+_start = time.monotonic()
+
+
+def ticks_ms() -> int:
+    # like supervisor.ticks_ms: milliseconds, wrapping around after 2**29
+    return int((time.monotonic() - _start) * 1000) & ((1 << 29) - 1)
+
+
+class Pin:
+    """A pin of the badge. Buttons are pins that are high while pressed."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = False
+        self.listeners = []
+
+    def set(self, value: bool):
+        if value == self.value:
+            return
+
+        self.value = value
+        for listener in self.listeners:
+            listener(self, value)
+
+    def __repr__(self):
+        return f"board.{self.name}"
+
+
+class Pipe:
+    """Bytes flowing in one direction: written on one end, read on the other."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.total = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def write(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode()
+
+        self.buffer += data
+        self.total += len(data)
+        return len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0 or size > len(self.buffer):
+            size = len(self.buffer)
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self.buffer))
+        buffer[:size] = self.buffer[:size]
+        del self.buffer[:size]
+        return size
+
+    def clear(self):
+        self.buffer.clear()
+
+
+class Connection:
+    """Both directions of a serial connection, seen from the badge.
+
+    `incoming` is what the badge reads, `outgoing` what it writes. `responder`, if set, gets
+    called with everything the badge writes and returns bytes to answer with (or None), to
+    script a device on the other end. `source`, if set, gets called before every read of the
+    badge and returns bytes arriving late (or None), for answers that take their time.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.incoming = Pipe()
+        self.outgoing = Pipe()
+        self.responder = None
+        self.source = None
+
+    def receive(self) -> Pipe:
+        # what the badge can read right now
+        if self.source:
+            arrived = self.source()
+            if arrived:
+                self.incoming.write(arrived)
+
+        return self.incoming
+
+    def badge_write(self, data) -> int:
+        written = self.outgoing.write(data)
+        if self.responder:
+            answer = self.responder(self.outgoing.read())
+            if answer:
+                self.incoming.write(answer)
+
+        return written
+
+
+class Display:
+    """The e-ink display: remembers every refresh and renders the shown group into a framebuffer.
+
+    The framebuffer has one byte per pixel, 1 for white and 0 for black. Refreshing sooner than
+    `refresh_interval` seconds after the last one raises, like the real panel does.
+    """
+
+    def __init__(self, width: int = WIDTH, height: int = HEIGHT, refresh_interval: float = 0.0):
+        self.width = width
+        self.height = height
+        self.refresh_interval = refresh_interval
+        self.reset()
+
+    def reset(self):
+        self.root_group = None
+        self.framebuffer = bytearray(b'\x01' * (self.width * self.height))
+        self.refreshes = []
+        self._last_refresh = None
+
+    @property
+    def time_to_refresh(self) -> float:
+        if self._last_refresh is None:
+            return 0.0
+
+        return max(0.0, self._last_refresh + self.refresh_interval - time.monotonic())
+
+    @property
+    def busy(self) -> bool:
+        return False
+
+    def refresh(self):
+        if self.time_to_refresh > 0:
+            raise RuntimeError("Refresh too soon")
+
+        self._last_refresh = time.monotonic()
+        self.render()
+        self.refreshes.append(self._last_refresh)
+
+    def render(self):
+        self.framebuffer[:] = b'\x01' * (self.width * self.height)
+        if self.root_group is not None:
+            self.root_group._render(self, 0, 0)
+
+    def texts(self) -> list:
+        # the text of every label shown, to check what is on screen without looking at pixels
+        found = []
+        if self.root_group is not None:
+            self.root_group._texts(found)
+        return found
+
+    def pixel(self, x: int, y: int) -> int:
+        return self.framebuffer[y * self.width + x]
+
+    def to_pbm(self) -> bytes:
+        # portable bitmap of the framebuffer, for looking at it with an image viewer
+        rows = []
+        for y in range(self.height):
+            row = self.framebuffer[y * self.width:(y + 1) * self.width]
+            rows.append(' '.join('0' if value else '1' for value in row))
+
+        return f"P1\n{self.width} {self.height}\n".encode() + '\n'.join(rows).encode() + b'\n'
+
+    def is_zebadge(self) -> bool:
+        return False
+
+
+class I2CDevice:
+    """Something on the I2C bus: answers reads with the bytes queued in `responses`."""
+
+    def __init__(self, address: int):
+        self.address = address
+        self.responses = []
+
+    def read(self, size: int) -> bytes:
+        if self.responses:
+            return self.responses.pop(0)[:size]
+        return bytes(size)
+
+
+PIN_NAMES = (
+    'SW_A', 'SW_B', 'SW_C', 'SW_UP', 'SW_DOWN', 'USER_SW', 'USER_LED',
+    'SCL', 'SDA', 'TX', 'RX', 'VBAT_SENSE', 'ENABLE_DIO',
+)
+
+pins = {name: Pin(name) for name in PIN_NAMES}
+display = Display()
+usb = Connection()
+uart = Connection()
+i2c_devices = {}
+
+# what storage.getmount('/').readonly reports
+read_only = False
+
+
+def reset():
+    # back to a freshly powered badge
+    global read_only
+
+    for pin in pins.values():
+        pin.value = False
+        pin.listeners.clear()
+
+    display.reset()
+    usb.reset()
+    uart.reset()
+    i2c_devices.clear()
+    read_only = False
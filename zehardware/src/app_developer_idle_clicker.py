@@ -1,7 +1,12 @@
-import gc
+import binascii
 import math
+import struct
+import time
+from array import array
+
 import zeos
 import ui
+import util
 from message import Message
 import displayio
 import vectorio
@@ -18,6 +23,10 @@ class Item:
         self.output = output
         self.sprite_index = index
 
+    def cost(self, owned: int) -> int:
+        # every purchase moves up one tier, the last tier stays
+        return self.costs[min(owned, len(self.costs) - 1)]
+
 
 _PROGRAMMER = ""
 
@@ -59,6 +68,22 @@ _SYMBOL_OFFSET_Y = (_SCREEN_HEIGHT - _VERTICAL_SYMBOL_COUNT * _SYMBOL_PIXEL_SIZE
 
 _SYMBOL_POSITIONS: list[tuple[float, float]] = len(_POSITION_SYMBOLS) * [(0.0, 0.0)]
 
+# saved game: magic, lines of code, number of items and symbols drawn, crc32 of what follows the header.
+# followed by the count of every item and the sprite index of every symbol drawn.
+_STATE_FILENAME = '.idle_state'
+_STATE_MAGIC = b'ZeI1'
+_STATE_HEADER = '<4sQHHI'
+
+# seconds between two saves of a changing game
+_SAVE_INTERVAL = 60
+
+# seconds in which every item produces its output once, however often the os ticks
+_PRODUCTION_INTERVAL = 0.2
+
+# idle_resources.bmp: 4 tiles per row, the item sprites and other symbols in the first four rows and
+# empty (white) tiles in the fifth. one of those is shown on free positions.
+_EMPTY_SPRITE_INDEX = 16
+
 
 class DeveloperIdleClickerApp:
     """This is an idle clicker for developers: Every "second" a new line of code is created. Buy more developers,
@@ -75,7 +100,22 @@ class DeveloperIdleClickerApp:
         self.lines_of_code = 0
         self.needs_refresh = True
 
-        self.inventory: list[Item] = [_ITEMS_[0]]
+        # how many of every item (same order as _ITEMS_) got bought, and the total output of all of them
+        self.counts = array('I', [0] * len(_ITEMS_))
+        self.output = 0
+
+        # the sprite of every item on screen, in order of purchase
+        self.symbols = bytearray()
+
+        if not self._load():
+            self._add(0)
+
+        # saves are coalesced: only if something changed, at most every save interval
+        self.save_interval = os.config.get('idle.save.interval', _SAVE_INTERVAL)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._writable = not util.read_only()
+        self._produced_at = time.monotonic()
 
         self._subscription_ids = []
         for i, v in enumerate(_POSITION_SYMBOLS):
@@ -87,7 +127,16 @@ class DeveloperIdleClickerApp:
 
         self.atlas = displayio.OnDiskBitmap("./idle_resources.bmp")
 
+        # the scene is kept between refreshes, only new items and the score get updated
+        self._group = None
+        self._symbols = None
+        self._score = None
+        self._drawn_items = 0
+
     def run(self):
+        # nothing gets produced while the game is not running
+        self._produced_at = time.monotonic()
+
         self._subscription_ids += [
             self.os.subscribe(
                 zeos.MessageKey.BUTTON_CHANGED,
@@ -103,6 +152,9 @@ class DeveloperIdleClickerApp:
         for subscription_id in self._subscription_ids:
             self.os.unsubscribe(subscription_id)
 
+        if self._dirty:
+            self._save()
+
     def _buttons_changed(self, changed_keys):
         if 'up' in changed_keys and not changed_keys['up']:
             self._up_released()
@@ -112,50 +164,65 @@ class DeveloperIdleClickerApp:
             self._refresh()
 
     def _up_released(self):
-        # replace with function or something
-        item = _ITEMS_[0]
-
-        # replace with cost calculation function
-        cost = item.costs[0]
-
-        if self.lines_of_code > cost:
-            self.lines_of_code -= cost
-            self.inventory += [item]
-            self.needs_refresh = True
+        self._buy(0)
 
     def _down_released(self):
-        # replace with function or something
-        item = _ITEMS_[-1]
+        self._buy(len(_ITEMS_) - 1)
 
-        # replace with cost calculation function
-        cost = item.costs[0]
+    def _buy(self, index):
+        cost = _ITEMS_[index].cost(self.counts[index])
 
         if self.lines_of_code > cost:
             self.lines_of_code -= cost
-            self.inventory += [item]
+            self._add(index)
             self.needs_refresh = True
+            self._dirty = True
+
+    def _add(self, index):
+        item = _ITEMS_[index]
+        self.counts[index] += 1
+        self.output += item.output
+
+        if len(self.symbols) < len(_SYMBOL_POSITIONS):
+            self.symbols.append(item.sprite_index)
 
     def _refresh(self):
-        group = displayio.Group()
-        font = terminalio.FONT
+        if self._group is None:
+            self._create_scene()
 
         # think about more fancy graphics, a background a thing and a stuff
 
-        for index, item in enumerate(self.inventory):
-            sim_x, sim_y = _SYMBOL_POSITIONS[index]
+        for index in range(self._drawn_items, len(self.symbols)):
+            self._draw_symbol(index, self.symbols[index])
+        self._drawn_items = len(self.symbols)
 
-            symbol = displayio.TileGrid(
+        self._score.text = f"{self.lines_of_code} loc"
+
+        self.os.messages.append(Message(ui.MessageKey.SHOW_GROUP, self._group))
+        self.needs_refresh = False
+
+    def _create_scene(self):
+        group = displayio.Group()
+        font = terminalio.FONT
+
+        tiles = (self.atlas.width // _SYMBOL_PIXEL_SIZE) * (self.atlas.height // _SYMBOL_PIXEL_SIZE)
+        if tiles > _EMPTY_SPRITE_INDEX:
+            # all symbols in one grid over the atlas
+            self._symbols = displayio.TileGrid(
                 bitmap=self.atlas,
                 pixel_shader=self.atlas.pixel_shader,
-                width=1,
-                height=1,
+                width=_HORIZONTAL_SYMBOL_COUNT,
+                height=_VERTICAL_SYMBOL_COUNT,
                 tile_width=_SYMBOL_PIXEL_SIZE,
                 tile_height=_SYMBOL_PIXEL_SIZE,
-                default_tile=item.sprite_index,
-                x=sim_x,
-                y=sim_y,
+                default_tile=_EMPTY_SPRITE_INDEX,
+                x=int(_SYMBOL_OFFSET_X),
+                y=int(_SYMBOL_OFFSET_Y),
             )
-            group.append(symbol)
+            group.append(self._symbols)
+        else:
+            # no empty tile in the atlas: one small grid per item, appended as bought
+            self._symbols = None
 
         score_area = label.Label(
             font,
@@ -168,6 +235,7 @@ class DeveloperIdleClickerApp:
         score_area.x = int(296 / 2)
         score_area.y = 113
         group.append(score_area)
+        self._score = score_area
 
         purchase_labels = label.Label(
             font,
@@ -181,21 +249,109 @@ class DeveloperIdleClickerApp:
         purchase_labels.y = int(128 / 4)
         group.append(purchase_labels)
 
-        self.os.messages.append(Message(ui.MessageKey.SHOW_GROUP, group))
-        self.needs_refresh = False
+        self._group = group
+        self._drawn_items = 0
 
-    def _calculate_output(self) -> int:
-        output = 0
-        for item in self.inventory:
-            output += item.output
+    def _draw_symbol(self, index, sprite_index):
+        sim_x, sim_y = _SYMBOL_POSITIONS[index]
 
-        return output
+        if self._symbols:
+            column = (sim_x - int(_SYMBOL_OFFSET_X)) // _SYMBOL_PIXEL_SIZE
+            row = (sim_y - int(_SYMBOL_OFFSET_Y)) // _SYMBOL_PIXEL_SIZE
+            self._symbols[column, row] = sprite_index
+        else:
+            symbol = displayio.TileGrid(
+                bitmap=self.atlas,
+                pixel_shader=self.atlas.pixel_shader,
+                width=1,
+                height=1,
+                tile_width=_SYMBOL_PIXEL_SIZE,
+                tile_height=_SYMBOL_PIXEL_SIZE,
+                default_tile=sprite_index,
+                x=sim_x,
+                y=sim_y,
+            )
+            # below the labels
+            self._group.insert(len(self._group) - 2, symbol)
 
     def _ticked(self):
-        output = self._calculate_output()
+        produced = int((time.monotonic() - self._produced_at) / _PRODUCTION_INTERVAL)
+        self._produced_at += produced * _PRODUCTION_INTERVAL
+
+        self.lines_of_code += self.output * produced
+        if self.output and produced:
+            self._dirty = True
 
-        self.lines_of_code += output
+        if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+            self._save()
 
         if self.needs_refresh:
-            gc.collect()
             self._refresh()
+
+    def _save(self, filename=_STATE_FILENAME) -> bool:
+        self._saved_at = time.monotonic()
+        if not self._writable:
+            # developer mode: the computer owns the file system
+            return False
+
+        body = bytes(self.counts) + self.symbols
+        header = struct.pack(
+            _STATE_HEADER,
+            _STATE_MAGIC,
+            self.lines_of_code,
+            len(self.counts),
+            len(self.symbols),
+            binascii.crc32(body),
+        )
+
+        def write(file):
+            file.write(header)
+            file.write(body)
+
+        try:
+            util.write_atomically(filename, write)
+            self._dirty = False
+            return True
+        except OSError as e:
+            print(f"Could not save idle game: {e}")
+            return False
+
+    def _load(self, filename=_STATE_FILENAME) -> bool:
+        for name in util.saved_files(filename):
+            try:
+                with open(name, 'rb') as file:
+                    state = _read_state(file)
+            except OSError:
+                # never saved
+                continue
+            except ValueError as e:
+                print(f"Could not load idle game from '{name}': {e}")
+                continue
+
+            self.lines_of_code, counts, self.symbols = state
+            for index in range(min(len(counts), len(self.counts))):
+                self.counts[index] = counts[index]
+            self.output = sum(count * item.output for count, item in zip(self.counts, _ITEMS_))
+            return True
+
+        return False
+
+
+def _read_state(file):
+    header = file.read(struct.calcsize(_STATE_HEADER))
+    if len(header) != struct.calcsize(_STATE_HEADER):
+        raise ValueError("State is too short.")
+
+    magic, lines_of_code, item_count, symbol_count, checksum = struct.unpack(_STATE_HEADER, header)
+    if magic != _STATE_MAGIC:
+        raise ValueError(f"Not an idle game: {magic}.")
+
+    counts_size = item_count * struct.calcsize('I')
+    body = bytearray(counts_size + symbol_count)
+    if file.readinto(body) != len(body) or binascii.crc32(body) != checksum:
+        raise ValueError("State is broken.")
+
+    counts = array('I', bytes(body[:counts_size]))
+    symbols = body[counts_size:counts_size + min(symbol_count, len(_SYMBOL_POSITIONS))]
+    return lines_of_code, counts, symbols
+
@@ -1,10 +1,21 @@
+import time
+
 import displayio
 
+import serial
 import ui
 import zeos
 from message import Message
+from message import obtain
 from ui import MessageKey as UIKeys
 
+# how long to decode neighbouring pages per tick, in seconds
+_PREFETCH_BUDGET = 0.05
+_PREFETCH_ROWS = 16
+
+# serial commands changing the stored files
+_FILE_COMMANDS = ('store', 'delete')
+
 
 class StoreAndShowApp:
     def __init__(self, os: zeos.ZeBadgeOs):
@@ -14,12 +25,27 @@ class StoreAndShowApp:
 
         self._subscription_ids = []
 
+        self._prefetch_queue = []
+        self._prefetching = None
+
     def run(self):
         self._subscription_ids += [
             self.os.subscribe(
                 zeos.MessageKey.BUTTON_CHANGED,
                 lambda os, message: self._buttons_changed(message.value)
             ),
+            self.os.subscribe(
+                zeos.MessageKey.TICK,
+                lambda os, message: self._ticked()
+            ),
+            self.os.subscribe(
+                serial.MessageKey.RECEIVED,
+                lambda os, message: self._serial_received(message.value)
+            ),
+            self.os.subscribe(
+                serial.MessageKey.RECEIVED_BINARY,
+                lambda os, message: self._serial_received(message.value)
+            ),
         ]
 
         self._load_last_shown()
@@ -28,6 +54,8 @@ class StoreAndShowApp:
         for subscription_id in self._subscription_ids:
             self.os.unsubscribe(subscription_id)
 
+        self._cancel_prefetch()
+
     def _buttons_changed(self, changed):
         if 'up' in changed and not changed['up']:
             self._load_previous()
@@ -37,7 +65,10 @@ class StoreAndShowApp:
     def _load_last_shown(self):
         try:
             last_badge_stored = open('.last_badge').read()
-            if 'b64' in last_badge_stored:
+            if ui.is_page(last_badge_stored):
+                last_badge_stored = ui.page_filename(last_badge_stored)
+                if last_badge_stored in self.files:
+                    self.index = self.files.index(last_badge_stored)
                 self._show_file(last_badge_stored)
             elif 'bmp' in last_badge_stored:
                 odb = displayio.OnDiskBitmap(last_badge_stored)
@@ -58,6 +89,9 @@ class StoreAndShowApp:
 
     def _load_next(self):
         self.files = self.os.get_stored_files()
+        if not self.files:
+            return
+
         self.index = (self.index + 1) % len(self.files)
 
         file = self.files[self.index]
@@ -65,6 +99,9 @@ class StoreAndShowApp:
 
     def _load_previous(self, ):
         self.files = self.os.get_stored_files()
+        if not self.files:
+            return
+
         length = len(self.files)
         self.index = (self.index + length - 1) % length
 
@@ -76,4 +113,49 @@ class StoreAndShowApp:
             open('.last_badge', 'w').write(filename)
         except OSError:
             print("OS Error (developer mode?)")
-        self.os.messages.append(Message(ui.MessageKey.SHOW_FILE, filename))
+        self.os.messages.append(obtain(ui.MessageKey.SHOW_FILE, filename))
+
+        self._queue_neighbours()
+
+    def _queue_neighbours(self):
+        self._cancel_prefetch()
+
+        length = len(self.files)
+        if length > 1:
+            self._prefetch_queue = [
+                self.files[(self.index + 1) % length],
+                self.files[(self.index + length - 1) % length],
+            ]
+
+    def _cancel_prefetch(self):
+        if self._prefetching:
+            self._prefetching.cancel()
+            self._prefetching = None
+
+        self._prefetch_queue = []
+
+    def _serial_received(self, received):
+        command, _, _ = received
+        if command in _FILE_COMMANDS:
+            self._cancel_prefetch()
+
+    def _ticked(self):
+        # only use idle ticks: nothing else is waiting to be done
+        if len(self.os.messages) > 0:
+            return
+
+        deadline = time.monotonic() + _PREFETCH_BUDGET
+        while time.monotonic() < deadline:
+            if not self._prefetching:
+                if not self._prefetch_queue:
+                    return
+
+                self._prefetching = ui.PageDecoder(self._prefetch_queue.pop(0))
+
+            try:
+                if self._prefetching.step(_PREFETCH_ROWS):
+                    self._prefetching = None
+            except Exception as e:
+                print(f"Could not prefetch '{self._prefetching.filename}': {e}")
+                self._prefetching.cancel()
+                self._prefetching = None
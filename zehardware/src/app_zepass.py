@@ -5,11 +5,21 @@ import terminalio
 from adafruit_display_text import label
 
 import ui
+import util
 import wifi
 import zeos
 from message import Message
 from ui import MessageKey as UIKeys
 
+# the last posts received, to show them right away after a reboot
+_CACHE_FILENAME = 'zepass.cache'
+
+# the response headers telling if the posts changed, sent back as the request headers asking for it
+_VALIDATORS = (
+    ('ETag', 'If-None-Match'),
+    ('Last-Modified', 'If-Modified-Since'),
+)
+
 
 class ZePassApp:
     def __init__(self, os: zeos.ZeBadgeOs):
@@ -17,6 +27,9 @@ class ZePassApp:
         self.subscription_ids = []
         self.method = ""
 
+        # validators of the posts shown, by response header name
+        self.validators = {}
+
     def run(self):
         self.subscription_ids += [
             self.os.subscribe(wifi.MessageKey.CONNECT_RESULT, self._connected),
@@ -29,6 +42,12 @@ class ZePassApp:
             ),
         ]
 
+        # show the cached posts until the server says if they are still current. validators only
+        # get sent for posts on screen, otherwise a 304 would leave it empty.
+        raw_posts = self._load()
+        if not raw_posts or not self._update_all_posts(raw_posts):
+            self.validators = {}
+
         self._fetch_all_posts()
 
     def unrun(self):
@@ -43,11 +62,15 @@ class ZePassApp:
             self._create_new_post()
 
     def _fetch_all_posts(self):
+        self.method = "GET"
+        if wifi.connected():
+            self._request(self.os)
+            return
+
         config = {
             'ssid': self.os.config['wifi.ssid'],
             'pwd': self.os.config['wifi.pwd']
         }
-        self.method = "GET"
         self.os.messages.append(Message(zeos.MessageKey.INFO, f'Connecting to wifi {config} '))
         self.os.messages.append(
             Message(
@@ -58,34 +81,45 @@ class ZePassApp:
 
     def _connected(self, os: zeos.ZeBadgeOs, message):
         if message.value:
-            config = {
-                'ip': os.config['wifi.ip'],
-                'url': os.config['wifi.url'],
-                'host': os.config['wifi.host'],
-                'port': os.config['wifi.port'],
-            }
+            self._request(os)
+        else:
+            os.messages.append(Message(zeos.MessageKey.ERROR, 'Could not connect'))
 
-            if self.method == "GET":
-                os.messages.append(Message(zeos.MessageKey.INFO, f'Connected, GETing posts {config}.'))
-                os.messages.append(Message(wifi.MessageKey.GET, config))
-            elif self.method == "POST":
-                config['body'] = os.config['user.uuid']
-                os.messages.append(Message(zeos.MessageKey.INFO, f'Connected, POSTing {config}.'))
-                os.messages.append(Message(wifi.MessageKey.POST, config))
-            else:
-                os.messages.append(
-                    Message(
-                        zeos.MessageKey.ERROR,
-                        f"Zepass method {self.method} not understood."
-                    )
-                )
-                self.method = ''
+    def _request(self, os: zeos.ZeBadgeOs):
+        config = {
+            'ip': os.config['wifi.ip'],
+            'url': os.config['wifi.url'],
+            'host': os.config['wifi.host'],
+            'port': os.config['wifi.port'],
+        }
 
+        if self.method == "GET":
+            # only download the posts if they changed since the ones shown
+            config['headers'] = {
+                request: self.validators[response]
+                for response, request in _VALIDATORS
+                if response in self.validators
+            }
+            os.messages.append(Message(zeos.MessageKey.INFO, f'Connected, GETing posts {config}.'))
+            os.messages.append(Message(wifi.MessageKey.GET, config))
+        elif self.method == "POST":
+            config['body'] = os.config['user.uuid']
+            os.messages.append(Message(zeos.MessageKey.INFO, f'Connected, POSTing {config}.'))
+            os.messages.append(Message(wifi.MessageKey.POST, config))
         else:
-            os.messages.append(Message(zeos.MessageKey.ERROR, 'Could not connect'))
+            os.messages.append(
+                Message(
+                    zeos.MessageKey.ERROR,
+                    f"Zepass method {self.method} not understood."
+                )
+            )
+            self.method = ''
 
     def _create_new_post(self):
         self.method = "POST"
+        if wifi.connected():
+            self._request(self.os)
+            return
 
         config = {
             'ssid': self.os.config['wifi.ssid'],
@@ -100,16 +134,33 @@ class ZePassApp:
         )
 
     def _response_received(self, os: zeos.ZeBadgeOs, message):
-        if self.method == "GET":
-            self._update_all_posts(
-                message.value.body
-            )
+        response = message.value
+        if not response:
+            os.messages.append(Message(zeos.MessageKey.ERROR, f'No response to {self.method}.'))
+
+        elif self.method == "GET":
+            if response.status == 304:
+                # nothing new: no parsing, no refresh
+                os.messages.append(Message(zeos.MessageKey.INFO, 'Posts did not change.'))
+                return
+
+            if response.status != 200:
+                os.messages.append(Message(zeos.MessageKey.ERROR, f'Could not get posts: {response.status}.'))
+                return
+
+            if self._update_all_posts(response.body):
+                self.validators = {}
+                for name, _ in _VALIDATORS:
+                    value = response.header(name)
+                    if value:
+                        self.validators[name] = value
+                self._save(response.body)
 
         elif self.method == "POST":
             self.method = None
             self._fetch_all_posts()
 
-    def _update_all_posts(self, raw_posts):
+    def _update_all_posts(self, raw_posts) -> bool:
         group = displayio.Group()
         font = terminalio.FONT
 
@@ -117,7 +168,7 @@ class ZePassApp:
             posts = json.loads(raw_posts)
         except ValueError as e:
             print(f'Could not parse response: {raw_posts}')
-            return
+            return False
 
         for index, post in enumerate(posts):
             # TODO: ADD FANCY USER LOGO HERE
@@ -155,3 +206,48 @@ class ZePassApp:
                 group
             )
         )
+        return True
+
+    def _save(self, raw_posts, filename=_CACHE_FILENAME) -> bool:
+        # the validators as header lines, an empty line, and the posts: like the response they came from
+        if util.read_only():
+            # developer mode: the computer owns the file system
+            return False
+
+        def write(file):
+            for name in self.validators:
+                file.write(f'{name}: {self.validators[name]}\n')
+            file.write('\n')
+            file.write(raw_posts)
+
+        try:
+            util.write_atomically(filename, write, 'w')
+            return True
+        except OSError as e:
+            print(f"Could not save posts: {e}")
+            return False
+
+    def _load(self, filename=_CACHE_FILENAME):
+        for name in util.saved_files(filename):
+            validators = {}
+            try:
+                with open(name, 'r') as file:
+                    line = file.readline()
+                    while line.strip():
+                        key, _, value = line.partition(':')
+                        validators[key.strip()] = value.strip()
+                        line = file.readline()
+                    raw_posts = file.read()
+            except OSError:
+                # never saved
+                continue
+
+            if not line or not raw_posts:
+                print(f"Could not load posts from '{name}'.")
+                continue
+
+            self.validators = validators
+            return raw_posts
+
+        return None
+
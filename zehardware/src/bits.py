@@ -0,0 +1,100 @@
+import binascii
+import struct
+
+try:
+    import bitmaptools
+except ImportError:
+    bitmaptools = None
+
+# stored pages: a small header, followed by the packed 1 bit pixels, row by row.
+#
+# magic, width, height, color of 0 bits, color of 1 bits, crc32 of the pixels
+_PAGE_MAGIC = b'ZeB1'
+_PAGE_HEADER = '<4sHHIII'
+PAGE_HEADER_SIZE = struct.calcsize(_PAGE_HEADER)
+
+# every possible byte, expanded to its 8 pixels (most significant bit first)
+_BYTE_TO_PIXELS = tuple(
+    bytes((value >> (7 - bit)) & 1 for bit in range(8))
+    for value in range(256)
+)
+
+
+def row_bytes(width: int) -> int:
+    """How many bytes are needed to store one row of a 1 bit image."""
+    return (width + 7) // 8
+
+
+def unpack_row(data, offset: int, width: int, row: bytearray):
+    """Expand one packed row of data, starting at offset, into one byte per pixel in row."""
+    lut = _BYTE_TO_PIXELS
+    x = 0
+    for index in range(offset, offset + row_bytes(width)):
+        row[x:x + 8] = lut[data[index]]
+        x += 8
+
+
+def unpack_rows(bitmap, data, width: int, start: int, end: int, row: bytearray = None):
+    """Fill rows [start, end) of the bitmap from the packed 1 bit data."""
+    stride = row_bytes(width)
+    if row is None:
+        row = bytearray(stride * 8)
+
+    pixels = memoryview(row)[:width]
+    for y in range(start, end):
+        unpack_row(data, y * stride, width, row)
+
+        if bitmaptools:
+            bitmaptools.arrayblit(bitmap, pixels, 0, y, width, y + 1)
+        else:
+            for x in range(width):
+                bitmap[x, y] = row[x]
+
+
+def unpack_into(bitmap, data, width: int, height: int):
+    """Fill the bitmap from packed 1 bit data, one row at a time instead of one pixel at a time."""
+    unpack_rows(bitmap, data, width, 0, height)
+
+
+def page_size(width: int, height: int) -> int:
+    """How many bytes the pixels of a page take, without the header."""
+    return row_bytes(width) * height
+
+
+def write_page(file, data, width: int, height: int, colors=(0x000000, 0xFFFFFF)):
+    """Write packed 1 bit pixels and their header as a page to the given file."""
+    if len(data) != page_size(width, height):
+        raise ValueError(f"Page of {width}x{height} needs {page_size(width, height)} bytes, not {len(data)}.")
+
+    file.write(
+        struct.pack(
+            _PAGE_HEADER,
+            _PAGE_MAGIC,
+            width,
+            height,
+            colors[0],
+            colors[1],
+            binascii.crc32(data),
+        )
+    )
+    file.write(data)
+
+
+def read_page(file):
+    """Read a page written by `write_page`. Returns the pixels, width, height and colors."""
+    header = file.read(PAGE_HEADER_SIZE)
+    if len(header) != PAGE_HEADER_SIZE:
+        raise ValueError("Page is too short.")
+
+    magic, width, height, black, white, checksum = struct.unpack(_PAGE_HEADER, header)
+    if magic != _PAGE_MAGIC:
+        raise ValueError(f"Not a page: {magic}.")
+
+    data = bytearray(page_size(width, height))
+    if file.readinto(data) != len(data):
+        raise ValueError("Page is truncated.")
+
+    if binascii.crc32(data) != checksum:
+        raise ValueError("Page checksum does not match.")
+
+    return data, width, height, (black, white)
@@ -0,0 +1,77 @@
+import gc
+
+
+class BitmapCache:
+    """A small least recently used cache of decoded pages.
+
+    Entries are stored by filename together with a stamp (size and modification time
+    of the file), so a changed file is never served from the cache. If free memory
+    drops below the watermark, the oldest entries get evicted first.
+    """
+
+    def __init__(self, size: int = 3, watermark: int = 24 * 1024):
+        self.size = size
+        self.watermark = watermark
+
+        # (filename, stamp, value) tuples, most recently used last
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def contains(self, filename, stamp) -> bool:
+        for name, entry_stamp, _ in self._entries:
+            if name == filename:
+                return entry_stamp == stamp
+
+        return False
+
+    def get(self, filename, stamp):
+        for index, (name, entry_stamp, value) in enumerate(self._entries):
+            if name == filename:
+                if entry_stamp != stamp:
+                    del self._entries[index]
+                    return None
+
+                # mark as most recently used
+                self._entries.append(self._entries.pop(index))
+                return value
+
+        return None
+
+    def put(self, filename, stamp, value):
+        if self.size <= 0:
+            return
+
+        self.invalidate(filename)
+        self._entries.append((filename, stamp, value))
+        self.trim()
+
+    def invalidate(self, filename):
+        for index, (name, _, _) in enumerate(self._entries):
+            if name == filename:
+                del self._entries[index]
+                return True
+
+        return False
+
+    def clear(self):
+        self._entries.clear()
+        gc.collect()
+
+    def trim(self):
+        while len(self._entries) > self.size:
+            self._entries.pop(0)
+
+        # keep the newest entry, even on low memory: it's about to be shown
+        while len(self._entries) > 1 and _memory_low(self.watermark):
+            self._entries.pop(0)
+
+
+def _memory_low(watermark) -> bool:
+    if not hasattr(gc, 'mem_free'):
+        # not on the badge, no idea how much is left.
+        return False
+
+    gc.collect()
+    return gc.mem_free() < watermark
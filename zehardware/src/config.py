@@ -2,25 +2,106 @@ import util
 
 _SPACE_REPLACEMENT_ = "$SPACE#"
 
-def _sanatize(config):
-    return config.replace('\r\n', '').replace('\n', ' ')
+
+class Config:
+    # the typed key value store behind `ze.conf`.
+    #
+    # the file keeps the `key=value key=value` text zeflash writes, with spaces in values
+    # escaped. it gets parsed once, single keys are read and set without touching the
+    # text again, and it is only written if keys changed since.
+
+    def __init__(self, filename: str = 'ze.conf'):
+        self.filename = filename
+        self._values = {}
+        self._dirty = set()
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        if key in self._values and self._values[key] == value and type(self._values[key]) is type(value):
+            return
+
+        self._values[key] = value
+        self._dirty.add(key)
+
+    def items(self):
+        return self._values.items()
+
+    def dirty(self):
+        # keys changed since the last load or save
+        return self._dirty
+
+    def update(self, content: str):
+        str_to_fields(self, content)
+
+    def load(self) -> bool:
+        for filename in util.saved_files(self.filename):
+            try:
+                with open(filename, 'r') as file:
+                    content = file.read()
+            except OSError:
+                continue
+
+            str_to_fields(self, content)
+            self._dirty.clear()
+            return True
+
+        print(f"No configuration found in '{self.filename}'.")
+        return False
+
+    def save(self) -> bool:
+        if not self._dirty:
+            return True
+
+        try:
+            util.write_atomically(self.filename, lambda file: file.write(fields_to_str(self)), 'w')
+        except OSError as e:
+            print(util.exception_to_readable(e))
+            return False
+
+        self._dirty.clear()
+        return True
+
+    def __str__(self):
+        return fields_to_str(self)
+
 
 def save_config(config, filename: str = 'ze.conf'):
+    if isinstance(config, Config):
+        return config.save()
+
     file = open(filename, 'w')
     if file:
-        file.write(
-            fields_to_str(_sanatize(config))
-        )
+        file.write(fields_to_str(config))
 
 
 def update_config(config, content: str):
     if content:
-        str_to_fields(config, _sanatize(content))
+        str_to_fields(config, content)
     else:
         print('No content to update.')
 
 
 def load_config(config, filename: str = 'ze.conf') -> bool:
+    if isinstance(config, Config):
+        return config.load()
+
     try:
         file = open(filename, 'r')
         if file:
@@ -35,10 +116,8 @@ def fields_to_str(obj) -> str:
     result = ""
     for field in obj:
         value = obj[field]
-        try:
+        if isinstance(value, str):
             value = value.replace(' ', _SPACE_REPLACEMENT_)
-        except Exception:
-            ''
 
         result += f'{field}={value} '
 
@@ -46,11 +125,11 @@ def fields_to_str(obj) -> str:
 
 
 def str_to_fields(obj, assignments):
-    l = list(filter(lambda y: len(y) == 2, map(lambda x: x.replace(_SPACE_REPLACEMENT_, ' ').replace('\n', '').split('=',1), assignments.split(' '))))
-    read = dict(l)
-    for key in read:
-        value = read[key]
-        obj[key] = _ensure_typed_value(value)
+    # one pass over `key=value` pairs, separated by any whitespace
+    for assignment in assignments.split():
+        key, separator, value = assignment.partition('=')
+        if key and separator:
+            obj[key] = _ensure_typed_value(value.replace(_SPACE_REPLACEMENT_, ' '))
 
 
 def _ensure_typed_value(value):
@@ -106,6 +185,30 @@ def __test__():
 
     assert '*****' == _hide_str('hello')
 
+    # the typed store: single keys, dirty tracking and newline separated updates
+    config = Config('ze.conf.test')
+    config.update(cfg)
+    __test_compare(config, expected)
+    assert 'wifi.ssid' in config.dirty()
+
+    config.update("wifi.port=1337\nuser.name=Ze$SPACE#Badge\r\n")
+    assert config['wifi.port'] == 1337
+    assert config.get('user.name') == 'Ze Badge'
+    assert config.get('missing', 23) == 23
+
+    assert config.save()
+    assert not config.dirty()
+    config['wifi.port'] = 1337
+    assert not config.dirty()
+
+    loaded = Config('ze.conf.test')
+    assert loaded.load()
+    __test_compare(loaded, config)
+    assert str(loaded) == str(config)
+
+    import os
+    os.remove('ze.conf.test')
+
 
 if __name__ == "__main__":
     # run a test to see if kaput
@@ -0,0 +1,203 @@
+import binascii
+import struct
+import time
+
+# A frame on the serial connection:
+#
+#   magic (2 bytes) | kind (1) | sequence (2) | length (2) | payload (length bytes) | crc32 (4)
+#
+# all little endian, the crc32 covers everything before it. An upload is a BEGIN frame with
+# 'command:meta:size' as payload, DATA frames with the payload in chunks and an END frame.
+# Every frame received gets answered with an ACK (all frames up to and including this
+# sequence received) or a NACK (please resend starting from this sequence).
+MAGIC = b'\x02Z'
+_HEADER = '<2sBHH'
+HEADER_SIZE = struct.calcsize(_HEADER)
+CRC_SIZE = 4
+MAX_PAYLOAD = 1024
+
+
+# A binary upload skips frames and base64: the raw payload follows its header directly.
+#
+#   magic (2 bytes) | header length (2) | payload length (4) | crc32 of payload (4) | header 'command:meta' | payload
+#
+# It gets answered with a single ACK frame once the payload arrived intact, or a NACK frame if
+# it is broken or stopped arriving.
+BINARY_MAGIC = b'\x02B'
+_BINARY_HEADER = '<2sHII'
+BINARY_HEADER_SIZE = struct.calcsize(_BINARY_HEADER)
+MAX_BINARY_PAYLOAD = 16 * 1024
+
+
+class Kind:
+    BEGIN = 1
+    DATA = 2
+    END = 3
+    ACK = 4
+    NACK = 5
+
+
+def encode(kind: int, sequence: int, payload=b'') -> bytes:
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Frame payload too big: {len(payload)} > {MAX_PAYLOAD}.")
+
+    frame = struct.pack(_HEADER, MAGIC, kind, sequence & 0xFFFF, len(payload)) + payload
+    return frame + struct.pack('<I', binascii.crc32(frame))
+
+
+def encode_binary(command: str, meta: str, payload: bytes) -> bytes:
+    if len(payload) > MAX_BINARY_PAYLOAD:
+        raise ValueError(f"Binary payload too big: {len(payload)} > {MAX_BINARY_PAYLOAD}.")
+
+    header = f'{command}:{meta}'.encode()
+    checksum = binascii.crc32(payload)
+    return struct.pack(_BINARY_HEADER, BINARY_MAGIC, len(header), len(payload), checksum) + header + payload
+
+
+def decode_binary_header(data):
+    """Return the length of the 'command:meta' header, the length of the payload following it and its crc32."""
+    magic, header_length, payload_length, checksum = struct.unpack(_BINARY_HEADER, data)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"Not a binary upload: {magic}.")
+
+    return header_length, payload_length, checksum
+
+
+def wait_for_answer(read, timeout: float = 1.0):
+    """Return the kind of the first frame read, ACK or NACK, or None if nothing arrived in time."""
+    reader = FrameReader()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        received = read()
+        if received:
+            reader.feed(received)
+
+        for kind, _, payload in reader.frames():
+            if payload is not None and kind in (Kind.ACK, Kind.NACK):
+                return kind
+
+    return None
+
+
+def distance(sequence: int, base: int) -> int:
+    """How far sequence is ahead of base, taking the 16 bit wrap around into account."""
+    return (sequence - base) & 0xFFFF
+
+
+class FrameReader:
+    """Collects incoming bytes and cuts them into frames.
+
+    Yields (kind, sequence, payload) tuples. The payload of a frame failing its checksum is
+    None, so the receiver can ask for it again. Garbage before a frame gets skipped."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+
+    def frames(self):
+        while True:
+            start = self.buffer.find(MAGIC)
+            if start < 0:
+                # keep a possible half magic at the end
+                if self.buffer[-1:] == MAGIC[:1]:
+                    self._drop(len(self.buffer) - 1)
+                else:
+                    self.buffer = bytearray()
+                return
+
+            self._drop(start)
+
+            if len(self.buffer) < HEADER_SIZE:
+                return
+
+            _, kind, sequence, length = struct.unpack(_HEADER, self.buffer[:HEADER_SIZE])
+            if length > MAX_PAYLOAD:
+                # not a frame after all, look for the next magic
+                self._drop(len(MAGIC))
+                continue
+
+            size = HEADER_SIZE + length + CRC_SIZE
+            if len(self.buffer) < size:
+                return
+
+            (checksum,) = struct.unpack('<I', self.buffer[size - CRC_SIZE:size])
+            if binascii.crc32(self.buffer[:size - CRC_SIZE]) == checksum:
+                payload = bytes(self.buffer[HEADER_SIZE:HEADER_SIZE + length])
+            else:
+                payload = None
+
+            self._drop(size)
+            yield kind, sequence, payload
+
+    def _drop(self, count):
+        if count > 0:
+            self.buffer = self.buffer[count:]
+
+
+class Sender:
+    """Sends a command with a (big) payload as frames, keeping up to `window` frames in flight.
+
+    Runs on the host side of the connection: `write` sends bytes to the badge, `read` returns
+    whatever bytes arrived from it (possibly none). Lost or broken frames are resent, starting
+    at the first frame not acknowledged (go back n)."""
+
+    def __init__(self, write, read, window: int = 4, chunk_size: int = 512, timeout: float = 1.0, retries: int = 5):
+        self.write = write
+        self.read = read
+        self.window = window
+        self.chunk_size = min(chunk_size, MAX_PAYLOAD)
+        self.timeout = timeout
+        self.retries = retries
+
+        self.sent_frames = 0
+
+    def send(self, command: str, meta: str, payload) -> bool:
+        if isinstance(payload, str):
+            payload = payload.encode()
+
+        frames = [encode(Kind.BEGIN, 0, f'{command}:{meta}:{len(payload)}'.encode())]
+        for offset in range(0, len(payload), self.chunk_size):
+            frames.append(encode(Kind.DATA, len(frames), payload[offset:offset + self.chunk_size]))
+        frames.append(encode(Kind.END, len(frames)))
+
+        reader = FrameReader()
+        base = 0
+        following = 0
+        rewound = -1
+        retries = 0
+        last_progress = time.monotonic()
+
+        while base < len(frames):
+            while following < len(frames) and following < base + self.window:
+                self.write(frames[following])
+                self.sent_frames += 1
+                following += 1
+
+            received = self.read()
+            if received:
+                reader.feed(received)
+
+            for kind, sequence, _ in reader.frames():
+                index = base + distance(sequence, base)
+                if kind == Kind.ACK and base <= index < len(frames):
+                    base = index + 1
+                    following = max(following, base)
+                    retries = 0
+                    last_progress = time.monotonic()
+                elif kind == Kind.NACK and base <= index < following and index != rewound:
+                    # all frames in flight after a lost one get nacked, only go back once
+                    following = index
+                    rewound = index
+
+            if time.monotonic() - last_progress > self.timeout:
+                retries += 1
+                if retries > self.retries:
+                    return False
+
+                following = base
+                rewound = -1
+                last_progress = time.monotonic()
+
+        return True
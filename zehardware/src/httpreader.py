@@ -0,0 +1,254 @@
+class HttpResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def header(self, name: str, default=None):
+        # header names are case insensitive
+        name = name.lower()
+        for key in self.headers:
+            if key.lower() == name:
+                return self.headers[key]
+        return default
+
+    def __str__(self):
+        return f"{self.status} {self.headers}\n{self.body}"
+
+
+# how the wifi module wraps what the server sent: '+IPD,<length>:' or '+IPD,<link>,<length>:'
+IPD = b'+IPD,'
+CLOSED = b'CLOSED'
+
+# biggest status line and headers accepted, in bytes
+MAX_HEAD = 4096
+
+# how much of the module's bytes get looked at in one go, and kept if they could be the start of something
+_WINDOW = 64
+_KEEP = 8
+
+_HEAD = 0
+_BODY = 1
+_CHUNK_SIZE = 2
+_CHUNK_DATA = 3
+_CHUNK_END = 4
+_TRAILER = 5
+_DONE = 6
+
+
+class HttpReader:
+    """Parses a http response out of the bytes a wifi module sends, while they arrive.
+
+    `feed` takes whatever came from the UART: +IPD packets get unwrapped by their length, and
+    anything the module says in between is skipped. The body goes to `on_body` chunk by chunk
+    if given (a file's `write` for example), is collected otherwise. Bodies end after their
+    Content-Length, their last chunk, or when the connection closes. `done` tells when the
+    response is complete, `rest` holds the bytes that arrived after it."""
+
+    def __init__(self, on_body=None):
+        self.on_body = on_body
+
+        self.status = None
+        self.headers = {}
+        self.body = bytearray()
+        self.done = False
+        self.closed = False
+        self.error = None
+        self.rest = b''
+
+        # payload bytes of the current +IPD packet still to come, and module bytes not understood yet
+        self._packet = 0
+        self._module = b''
+
+        self._state = _HEAD
+        self._head = b''
+        self._remaining = 0
+        self._line = b''
+
+    def feed(self, data):
+        if self.done:
+            self.rest += data
+            return
+
+        view = memoryview(data)
+        position = 0
+        while position < len(view) and not self.done:
+            if self._packet:
+                end = min(len(view), position + self._packet)
+                self._packet -= end - position
+                self._http(view[position:end])
+                position = end
+            else:
+                position = self._module_bytes(view, position)
+
+        if position < len(view):
+            self.rest += bytes(view[position:])
+
+    def response(self) -> HttpResponse:
+        body = None if self.on_body else self.body.decode()
+        return HttpResponse(self.status, self.headers, body)
+
+    def _module_bytes(self, view, position) -> int:
+        # look for the next +IPD header in what the module sent, return where its payload starts
+        module = self._module + bytes(view[position:position + _WINDOW])
+        start = module.find(IPD)
+        if start >= 0:
+            separator = module.find(b':', start)
+            if separator >= 0:
+                self._chatter(module[:start])
+                consumed = separator + 1 - len(self._module)
+                self._module = b''
+                try:
+                    self._packet = _length(module[start + len(IPD):separator].split(b',')[-1])
+                except ValueError:
+                    self._fail(f"Not a packet header: {repr(module[start:separator + 1])}.")
+                return position + consumed
+
+        # keep what could still turn into a +IPD header
+        consumed = len(module) - len(self._module)
+        keep = start if start >= 0 else max(0, len(module) - _KEEP)
+        self._chatter(module)
+        self._module = module[keep:]
+        return position + consumed
+
+    def _chatter(self, data):
+        if CLOSED in data:
+            self.closed = True
+            if self._state == _BODY and self._remaining is None:
+                # the connection ending is the end of the body
+                self._state = _DONE
+                self.done = True
+            elif not self.done:
+                self._fail("Connection closed before the response was complete.")
+
+    def _http(self, data):
+        while data and not self.done:
+            state = self._state
+            if state == _HEAD:
+                data = self._read_head(data)
+            elif state == _BODY:
+                if self._remaining is None:
+                    self._emit(data)
+                    return
+
+                taken = min(len(data), self._remaining)
+                self._emit(data[:taken])
+                self._remaining -= taken
+                data = data[taken:]
+                if not self._remaining:
+                    self._finish()
+            elif state == _CHUNK_SIZE or state == _CHUNK_END or state == _TRAILER:
+                data = self._read_line(data)
+            elif state == _CHUNK_DATA:
+                taken = min(len(data), self._remaining)
+                self._emit(data[:taken])
+                self._remaining -= taken
+                data = data[taken:]
+                if not self._remaining:
+                    self._state = _CHUNK_END
+            else:
+                break
+
+        if data:
+            self.rest += bytes(data)
+
+    def _read_head(self, data):
+        head = self._head + bytes(data)
+        end = head.find(b'\r\n\r\n')
+        if end < 0:
+            if len(head) > MAX_HEAD:
+                self._fail(f"Headers bigger than {MAX_HEAD} bytes.")
+            self._head = head
+            return b''
+
+        self._head = b''
+        try:
+            lines = head[:end].decode().split('\r\n')
+        except ValueError:
+            self._fail("Headers are not text.")
+            return b''
+
+        try:
+            self.status = int(lines[0].split()[1])
+        except (IndexError, ValueError):
+            self._fail(f"Not a http status line: '{lines[0]}'.")
+            return b''
+
+        for line in lines[1:]:
+            key, _, value = line.partition(':')
+            self.headers[key.strip()] = value.strip()
+
+        response = HttpResponse(self.status, self.headers, None)
+        length = response.header('Content-Length')
+        if self.status in (204, 304) or 100 <= self.status < 200:
+            self._finish()
+        elif 'chunked' in response.header('Transfer-Encoding', '').lower():
+            self._state = _CHUNK_SIZE
+        elif length is not None:
+            self._state = _BODY
+            try:
+                self._remaining = _length(length)
+            except ValueError:
+                self._fail(f"Not a Content-Length: '{length}'.")
+                return b''
+
+            if not self._remaining:
+                self._finish()
+        else:
+            self._state = _BODY
+            self._remaining = None
+
+        # the body might have arrived in the same packet
+        return memoryview(head)[end + 4:]
+
+    def _read_line(self, data):
+        window = bytes(data[:_WINDOW])
+        end = window.find(b'\n')
+        if end < 0:
+            self._line += window
+            return data[len(window):]
+
+        line = (self._line + window[:end]).strip()
+        self._line = b''
+        data = data[end + 1:]
+
+        if self._state == _CHUNK_SIZE:
+            try:
+                self._remaining = _length(line.split(b';')[0], 16)
+            except ValueError:
+                self._fail(f"Not a chunk size: {repr(line[:20])}.")
+                return b''
+
+            self._state = _CHUNK_DATA if self._remaining else _TRAILER
+        elif self._state == _CHUNK_END:
+            self._state = _CHUNK_SIZE
+        elif not line:
+            # empty line after the trailer headers
+            self._finish()
+
+        return data
+
+    def _emit(self, data):
+        if not data:
+            return
+
+        if self.on_body:
+            self.on_body(bytes(data))
+        else:
+            self.body += data
+
+    def _finish(self):
+        self._state = _DONE
+        self.done = True
+
+    def _fail(self, error):
+        self.error = error
+        self._finish()
+
+
+def _length(text, base=10) -> int:
+    # a length the other side sent, raises a ValueError if it is none
+    length = int(text, base)
+    if length < 0:
+        raise ValueError(f"Negative length: {length}.")
+    return length
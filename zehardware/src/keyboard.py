@@ -1,3 +1,5 @@
+import time
+
 import board
 import usb_hid
 from message import Message
@@ -6,6 +8,8 @@ from adafruit_hid.keyboard_layout_us import KeyboardLayout
 from adafruit_hid.keycode import Keycode
 
 from message import Message
+from message import Priority
+from message import obtain
 import zeos
 
 
@@ -34,17 +38,27 @@ SPECIAL_CARD_KEYS = {
     0x8A: Keycode.F10,
 }
 
+# how often to ask the keyboard for a key while typing and while not, and how long typing lasts, in seconds
+_INTERVAL = 0.05
+_IDLE_INTERVAL = 0.2
+_TYPING = 2.0
+
 i2c = board.I2C()
 keyboard = Keyboard(usb_hid.devices)
 layout = KeyboardLayout(keyboard)
 
+_key_pressed_at = None
+
 
 def init(os):
-    os.tasks.append(update_keyboard)
+    os.add_task(update_keyboard, _INTERVAL, idle_interval=_IDLE_INTERVAL)
     os.subscribe(MessageKey.KEY_PRESSED, on_key_pressed)
+    os.messages.priorities[MessageKey.KEY_PRESSED] = Priority.INPUT
 
 
-def update_keyboard(os):
+def update_keyboard(os) -> bool:
+    global _key_pressed_at
+
     while not i2c.try_lock():
         continue
 
@@ -52,9 +66,14 @@ def update_keyboard(os):
     i2c.readfrom_into(95, buffer)
     i2c.unlock()
 
+    now = time.monotonic()
     if buffer[0]:
         key = buffer[0]
-        os.messages.append(Message(MessageKey.KEY_PRESSED, key))
+        os.messages.append(obtain(MessageKey.KEY_PRESSED, key))
+        _key_pressed_at = now
+
+    # busy while typing, the next key is likely to follow soon
+    return _key_pressed_at is not None and now - _key_pressed_at < _TYPING
 
 
 def on_key_pressed(os, message):
@@ -1,8 +1,103 @@
 class Message:
     # a message that can be sent over
+    __slots__ = ('topic', 'value', 'pooled')
+
     def __init__(self, topic: str, value=None):
         self.topic = topic
         self.value = value
+        self.pooled = False
 
     def __str__(self):
         return f"{self.topic}: {self.value}"
+
+
+# free messages to be reused by `obtain`, instead of allocating new ones for frequent messages
+_POOL_SIZE = 16
+_pool = []
+
+
+def obtain(topic: str, value=None) -> Message:
+    # a message from the pool: the os recycles it after dispatching, so subscribers must not keep it.
+    if _pool:
+        message = _pool.pop()
+        message.topic = topic
+        message.value = value
+    else:
+        message = Message(topic, value)
+        message.pooled = True
+
+    return message
+
+
+def recycle(message: Message):
+    if message.pooled and len(_pool) < _POOL_SIZE:
+        message.topic = None
+        message.value = None
+        _pool.append(message)
+
+
+class Priority:
+    # lower gets dispatched first
+    INPUT = 0
+    NORMAL = 1
+    DISPLAY = 2
+    IDLE = 3
+
+
+class MessageQueue:
+    # messages waiting to be dispatched, by priority.
+    #
+    # the lists are reused: `take` hands out everything appended so far and starts
+    # collecting into the lists of the batch before. For coalesced topics only the
+    # latest message matters, older ones are skipped by `dispatchable`.
+
+    def __init__(self, priorities=None, coalesced=()):
+        self.priorities = priorities if priorities is not None else {}
+        self.coalesced = coalesced
+
+        self._pending = [[] for _ in range(Priority.IDLE + 1)]
+        self._taken = [[] for _ in range(Priority.IDLE + 1)]
+        self._latest = {}
+
+    def __len__(self):
+        count = 0
+        for messages in self._pending:
+            count += len(messages)
+        return count
+
+    def append(self, message):
+        topic = message.topic
+        messages = self._pending[self.priorities.get(topic, Priority.NORMAL)]
+
+        if topic in self.coalesced:
+            if self._latest.get(topic) is message and message in messages:
+                # the very same (preallocated) message is still waiting, move it to the end
+                messages.remove(message)
+            self._latest[topic] = message
+
+        messages.append(message)
+
+    def clear(self):
+        for messages in self._pending:
+            messages.clear()
+        self._latest.clear()
+
+    def take(self):
+        # all messages appended since the last call, one list per priority, highest first
+        for messages in self._taken:
+            messages.clear()
+
+        self._pending, self._taken = self._taken, self._pending
+        return self._taken
+
+    def dispatchable(self, message) -> bool:
+        # False if a newer message of the same coalesced topic was appended after this one
+        topic = message.topic
+        if topic not in self._latest:
+            return True
+
+        if self._latest[topic] is not message:
+            return False
+
+        del self._latest[topic]
+        return True
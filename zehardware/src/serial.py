@@ -1,37 +1,121 @@
-import usb_cdc
+import binascii
+import os as systemos
 import re
+import time
+
 import supervisor
+import usb_cdc
 
+import frames
 from message import Message
 import zeos
 
 class MessageKey:
     RESPOND = "SERIAL_RESPOND"
     RECEIVED = "SERIAL_RECEIVED"
+    RECEIVED_BINARY = "SERIAL_RECEIVED_BINARY"
+
+
+# commands getting the payload of a framed upload as a stream to read from, instead of a string
+STREAMED_COMMANDS = ('store', 'preview')
+
+# how often to look for input while receiving, and how long a text command has to stay quiet to be
+# complete, in seconds. Without anything being received, input arriving wakes the os.
+_INPUT_INTERVAL = 0.02
+_TEXT_IDLE = 0.1
+
+# how long a binary upload may stop arriving before it gets dropped, in seconds
+_BINARY_TIMEOUT = 1.0
+
+# what this side of the connection understands, see the `capabilities` command
+CAPABILITIES = ('text', 'frames', 'binary')
+
+_UPLOAD_FILENAME = '.upload'
+
+_text = b''
+_text_received = 0.0
+_frame_reader = frames.FrameReader()
+_frame_received = 0.0
+_upload = None
+_binary = None
 
 
 def init(os):
     if usb_cdc.data:
         usb_cdc.data.timeout = 0.1
-        os.tasks.append(_read_input)
+        os.add_task(_read_input, _INPUT_INTERVAL, idle_interval=zeos.NEVER, ready=_input_waiting)
 
         os.subscribe(MessageKey.RESPOND, _output_requested)
 
+        # subscribed after the os, so this runs once the command got its payload
+        os.subscribe(MessageKey.RECEIVED, _payload_handled)
+
 
 def _output_requested(os, message):
     usb_cdc.data.write(message.value)
 
 
-def _read_input(os):
+def _read_input(os) -> bool:
+    _receive_input(os)
+
+    # busy while something is halfway received
+    return bool(_text or _upload or _binary or _frame_reader.buffer)
+
+
+def _input_waiting() -> bool:
+    return usb_cdc.data.in_waiting > 0
+
+
+def _receive_input(os):
+    global _text, _text_received, _frame_received
+
     if not supervisor.runtime.usb_connected:
         return
 
     if not supervisor.runtime.serial_connected:
         return
 
-    read_bytes = usb_cdc.data.read()
-    cleaned = re.sub(r'\s', " ", read_bytes.decode()).strip()
-    del read_bytes
+    if _binary:
+        _receive_binary(os)
+        return
+
+    waiting = usb_cdc.data.in_waiting
+    idle = not (_text or _upload or _frame_reader.buffer)
+    if idle and waiting >= len(frames.BINARY_MAGIC):
+        # peek, binary uploads get read into their own buffer directly
+        read_bytes = usb_cdc.data.read(len(frames.BINARY_MAGIC))
+        if read_bytes == frames.BINARY_MAGIC:
+            _begin_binary(os)
+            return
+
+        waiting = usb_cdc.data.in_waiting
+        if waiting:
+            read_bytes += usb_cdc.data.read(waiting)
+    else:
+        read_bytes = usb_cdc.data.read(waiting) if waiting else b''
+
+    if _upload or _frame_reader.buffer or (idle and read_bytes[:2] == frames.MAGIC):
+        if read_bytes:
+            _frame_reader.feed(read_bytes)
+            _frame_received = time.monotonic()
+        del read_bytes
+
+        _handle_frames(os)
+        if not _upload:
+            _leave_frames()
+        return
+
+    if read_bytes:
+        # wait until the host is done writing, a command can span several reads.
+        _text += read_bytes
+        _text_received = time.monotonic()
+        return
+
+    if not _text or time.monotonic() - _text_received < _TEXT_IDLE:
+        return
+
+    cleaned = re.sub(r'\s', " ", _text.decode()).strip()
+    _text = b''
 
     if len(cleaned) <= 0:
         return
@@ -48,6 +132,230 @@ def _read_input(os):
     os.messages.append(Message(MessageKey.RECEIVED, (command, meta, payload)))
 
 
+class _Upload:
+    """A framed upload being received: collected in a file, or in memory on a read only filesystem."""
+
+    def __init__(self, command, meta, size, sequence):
+        self.command = command
+        self.meta = meta
+        self.size = size
+        self.expected = (sequence + 1) & 0xFFFF
+        self.received = 0
+        self.header = b''
+
+        try:
+            self._file = open(_UPLOAD_FILENAME, 'wb')
+            self._memory = None
+        except OSError:
+            self._file = None
+            self._memory = bytearray()
+
+    def write(self, data):
+        self.received += len(data)
+        if self._file:
+            self._file.write(data)
+        else:
+            self._memory += data
+
+    def payload(self):
+        if self._file:
+            self._file.close()
+            self._file = open(_UPLOAD_FILENAME, 'rb')
+            if self.command in STREAMED_COMMANDS:
+                return self._file
+
+            payload = self._file.read()
+        else:
+            payload = self._memory
+
+        return payload.decode()
+
+    def close(self):
+        self._memory = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+            try:
+                systemos.remove(_UPLOAD_FILENAME)
+            except OSError:
+                pass
+
+
+# the last finished upload, its payload might still be read by a command
+_finished_upload = None
+
+
+def _handle_frames(os):
+    global _upload
+    global _finished_upload
+
+    for kind, sequence, payload in _frame_reader.frames():
+        if kind == frames.Kind.BEGIN and payload is not None:
+            if _upload and _upload.header == payload:
+                # the acknowledgement got lost, keep the upload going
+                _respond_frame(frames.Kind.ACK, sequence)
+                continue
+
+            _discard_uploads()
+            try:
+                command, meta, size = payload.decode().split(':')
+                _upload = _Upload(command, meta, int(size), sequence)
+                _upload.header = payload
+            except ValueError:
+                # might not even be text
+                print(f"Invalid upload: {repr(payload[:20])}")
+                _respond_frame(frames.Kind.NACK, sequence)
+                continue
+
+            _respond_frame(frames.Kind.ACK, sequence)
+
+        elif not _upload:
+            if _finished_upload and kind == frames.Kind.END and sequence == _finished_upload.expected:
+                # the acknowledgement of the end got lost
+                _respond_frame(frames.Kind.ACK, sequence)
+            else:
+                # nothing to receive this for, make the sender start over
+                _respond_frame(frames.Kind.NACK, 0)
+
+        elif payload is None:
+            # broken frame, send again please
+            _respond_frame(frames.Kind.NACK, _upload.expected)
+
+        elif frames.distance(sequence, _upload.expected) >= 0x8000:
+            # an old frame sent again: acknowledge everything received so far
+            _respond_frame(frames.Kind.ACK, _upload.expected - 1)
+
+        elif sequence != _upload.expected:
+            # a frame got lost in between
+            _respond_frame(frames.Kind.NACK, _upload.expected)
+
+        elif kind == frames.Kind.DATA and _upload.received + len(payload) <= _upload.size:
+            _upload.write(payload)
+            _upload.expected = (sequence + 1) & 0xFFFF
+            _respond_frame(frames.Kind.ACK, sequence)
+
+        elif kind == frames.Kind.END and _upload.received == _upload.size:
+            _respond_frame(frames.Kind.ACK, sequence)
+
+            upload = _upload
+            _upload = None
+            _finished_upload = upload
+
+            os.messages.append(Message(zeos.MessageKey.INFO, f"Upload with {upload.size} bytes received."))
+            os.messages.append(Message(MessageKey.RECEIVED, (upload.command, upload.meta, upload.payload())))
+
+            # whatever follows might be a text command again
+            return
+
+        else:
+            print(f"Invalid frame {kind} in upload, aborting.")
+            _respond_frame(frames.Kind.NACK, 0)
+            _discard_uploads()
+
+
+def _leave_frames():
+    global _text, _text_received
+
+    # without an upload going on, only a frame still arriving stays with the frames. Anything
+    # else, or a frame never completed, is text again.
+    buffer = _frame_reader.buffer
+    if not buffer:
+        return
+
+    if buffer[:len(frames.MAGIC)] == frames.MAGIC[:len(buffer)]:
+        if time.monotonic() - _frame_received < _BINARY_TIMEOUT:
+            return
+
+    _frame_reader.buffer = bytearray()
+    _text += buffer
+    _text_received = time.monotonic()
+
+
+def _payload_handled(os, message):
+    # the command is done with the payload: drop it, but keep the upload to acknowledge its end again
+    if _finished_upload:
+        _finished_upload.close()
+
+
+def _discard_uploads():
+    global _upload
+    global _finished_upload
+
+    if _upload:
+        _upload.close()
+        _upload = None
+
+    if _finished_upload:
+        _finished_upload.close()
+        _finished_upload = None
+
+
+class _BinaryUpload:
+    """A binary upload being received: raw payload bytes read straight into a preallocated buffer."""
+
+    def __init__(self, command, meta, size, checksum):
+        self.command = command
+        self.meta = meta
+        self.checksum = checksum
+        self.buffer = bytearray(size)
+        self.received = 0
+        self.received_at = time.monotonic()
+
+
+def _begin_binary(os):
+    global _binary
+
+    try:
+        header = usb_cdc.data.read(frames.BINARY_HEADER_SIZE - len(frames.BINARY_MAGIC))
+        header_length, payload_length, checksum = frames.decode_binary_header(frames.BINARY_MAGIC + header)
+        if payload_length > frames.MAX_BINARY_PAYLOAD:
+            raise ValueError(f"Binary payload too big: {payload_length}.")
+
+        command, meta = usb_cdc.data.read(header_length).decode().split(':')
+    except (ValueError, TypeError) as e:
+        print(f"Invalid binary upload: {e}")
+        usb_cdc.data.reset_input_buffer()
+        _respond_frame(frames.Kind.NACK, 0)
+        return
+
+    _binary = _BinaryUpload(command, meta, payload_length, checksum)
+    _receive_binary(os)
+
+
+def _receive_binary(os):
+    global _binary
+
+    upload = _binary
+    waiting = min(usb_cdc.data.in_waiting, len(upload.buffer) - upload.received)
+    if waiting:
+        view = memoryview(upload.buffer)
+        upload.received += usb_cdc.data.readinto(view[upload.received:upload.received + waiting])
+        upload.received_at = time.monotonic()
+
+    if upload.received < len(upload.buffer):
+        if time.monotonic() - upload.received_at > _BINARY_TIMEOUT:
+            # the sender gave up or got cut off: listen for commands again
+            print(f"Binary upload stopped after {upload.received} of {len(upload.buffer)} bytes.")
+            _binary = None
+            _respond_frame(frames.Kind.NACK, 0)
+        return
+
+    _binary = None
+    if binascii.crc32(upload.buffer) != upload.checksum:
+        print("Binary upload is broken, crc32 does not match.")
+        _respond_frame(frames.Kind.NACK, 0)
+        return
+
+    _respond_frame(frames.Kind.ACK, 0)
+    os.messages.append(Message(zeos.MessageKey.INFO, f"Binary payload with {upload.received} bytes received."))
+    os.messages.append(Message(MessageKey.RECEIVED_BINARY, (upload.command, upload.meta, upload.buffer)))
+
+
+def _respond_frame(kind, sequence):
+    usb_cdc.data.write(frames.encode(kind, sequence))
+
+
 def _parse_input(serial_input):
     if serial_input is None:
         return None
@@ -0,0 +1,57 @@
+import time
+
+
+class Stats:
+    """Timings of everything the os calls: tasks and subscribers.
+
+    For every name, the number of calls, their cumulative and their longest duration are
+    recorded, next to the depth of the message queue per loop iteration. Only exists while
+    enabled, so the os does not pay for it otherwise.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.iterations = 0
+        self.queued = 0
+        self.max_queued = 0
+
+    def reset(self):
+        self.entries.clear()
+        self.iterations = 0
+        self.queued = 0
+        self.max_queued = 0
+
+    def measure(self, name, function, *args):
+        start = time.monotonic_ns()
+        try:
+            return function(*args)
+        finally:
+            self.record(name, time.monotonic_ns() - start)
+
+    def record(self, name, duration):
+        entry = self.entries.get(name)
+        if entry is None:
+            # calls, cumulative and longest duration in nanoseconds
+            entry = [0, 0, 0]
+            self.entries[name] = entry
+
+        entry[0] += 1
+        entry[1] += duration
+        if duration > entry[2]:
+            entry[2] = duration
+
+    def queue_depth(self, depth):
+        self.iterations += 1
+        self.queued += depth
+        if depth > self.max_queued:
+            self.max_queued = depth
+
+    def report(self) -> str:
+        average = self.queued / self.iterations if self.iterations else 0
+        lines = [f"iterations={self.iterations} queue.avg={average:.2f} queue.max={self.max_queued}"]
+
+        # slowest in total first
+        for name, (calls, total, longest) in sorted(self.entries.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name} calls={calls} total={total // 1000}us max={longest // 1000}us")
+
+        return "\n".join(lines)
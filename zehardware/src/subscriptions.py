@@ -0,0 +1,59 @@
+class Subscriptions:
+    """Who listens to which topic.
+
+    `topics` maps every topic to a tuple of (id, subscriber) pairs, rebuilt only when
+    the subscriptions of that topic change: dispatching iterates over it directly, so
+    subscribing or unsubscribing from inside a subscriber is safe. `index` maps every
+    subscription id to its topic, making unsubscribing a single lookup.
+    """
+
+    def __init__(self):
+        self._next_id = 0
+
+        # topic -> ((id, subscriber), ...)
+        self.topics = {}
+
+        # id -> topic
+        self.index = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, subscription_id):
+        return subscription_id in self.index
+
+    def subscribe(self, topic, subscriber) -> int:
+        subscription_id = self._next_id
+        self._next_id += 1
+
+        self.topics[topic] = self.topics.get(topic, ()) + ((subscription_id, subscriber),)
+        self.index[subscription_id] = topic
+
+        return subscription_id
+
+    def unsubscribe(self, subscription_id) -> bool:
+        topic = self.index.pop(subscription_id, None)
+        if topic is None:
+            return False
+
+        remaining = tuple(entry for entry in self.topics[topic] if entry[0] != subscription_id)
+        if remaining:
+            self.topics[topic] = remaining
+        else:
+            del self.topics[topic]
+
+        return True
+
+    def get(self, topic) -> tuple:
+        return self.topics.get(topic, ())
+
+    def clear(self):
+        self.topics.clear()
+        self.index.clear()
+
+    def copy(self):
+        result = Subscriptions()
+        result._next_id = self._next_id
+        result.topics = self.topics.copy()
+        result.index = self.index.copy()
+        return result
@@ -1,3 +1,4 @@
+import os as systemos
 import time
 import zlib
 
@@ -5,7 +6,10 @@ import board
 import circuitpython_base64 as base64
 import displayio
 
+import bits
+import util
 import zeos
+from cache import BitmapCache
 from message import Message
 
 
@@ -17,25 +21,104 @@ class MessageKey:
     REFRESH = "REFRESH"
 
 
+# sent often and always the same, so allocated once
+REFRESH_MESSAGE = Message(MessageKey.REFRESH)
+
+_cache = BitmapCache()
+
+# how often to check whether a requested refresh can be done, in seconds
+_REFRESH_INTERVAL = 0.1
+
+# when a refresh got requested (monotonic_ns), None if there is none pending
+_refresh_requested_at = None
+
+# the task doing the refresh, only running while one is pending
+_refresher = None
+
+# failed refreshes in a row, the pending refresh gets dropped after too many
+_REFRESH_RETRIES = 5
+_refresh_failures = 0
+
+# display metrics: refreshes done, time spent in them and waiting for the display to allow them
+refresh_count = 0
+refresh_blocked_ns = 0
+refresh_waited_ns = 0
+
+
 def init(os):
+    global _refresher
+
+    _cache.size = os.config.get('ui.cache.size', _cache.size)
+    _cache.watermark = os.config.get('ui.cache.watermark', _cache.watermark)
+
     os.subscribe(MessageKey.SHOW_GROUP, _show_group)
     os.subscribe(MessageKey.SHOW_BITMAP, _show_bitmap_handler)
     os.subscribe(MessageKey.SHOW_FILE, _show_file_handler)
     os.subscribe(MessageKey.SHOW_TERMINAL, _show_terminal_handler)
     os.subscribe(MessageKey.REFRESH, _refresh_handler)
 
+    _refresher = os.add_task(_refresh_task, _REFRESH_INTERVAL, idle_interval=zeos.NEVER)
+    if _refresh_requested_at is None:
+        # nothing to refresh yet, sleep until requested
+        _refresher.deadline = zeos.NEVER
+
+
+def request_refresh():
+    # refresh the display as soon as it allows to, without waiting for it here
+    global _refresh_requested_at
 
-def _refresh_display_save():
-    time.sleep(board.DISPLAY.time_to_refresh + 0.3)
+    if _refresh_requested_at is None:
+        _refresh_requested_at = time.monotonic_ns()
+        if _refresher:
+            _refresher.wake()
 
+
+def refresh_report() -> str:
+    # how often the display got refreshed, and how long that blocked the os and waited for the display
+    return (
+        f"display refreshes={refresh_count} "
+        f"blocked={refresh_blocked_ns // 1000}us "
+        f"waited={refresh_waited_ns // 1000000}ms"
+    )
+
+
+def _refresh_task(os) -> bool:
+    # busy while a refresh is pending
+    global _refresh_requested_at, _refresh_failures, refresh_count, refresh_blocked_ns, refresh_waited_ns
+
+    if _refresh_requested_at is None:
+        return False
+
+    display = board.DISPLAY
+    if display.time_to_refresh > 0 or getattr(display, 'busy', False):
+        return True
+
+    start = time.monotonic_ns()
     try:
-        board.DISPLAY.refresh()
-    except:
-        print("x")
+        display.refresh()
+    except Exception as e:
+        # refreshed too soon after all? try again next time, but not forever
+        _refresh_failures += 1
+        if _refresh_failures < _REFRESH_RETRIES:
+            print(f"x {e}")
+            return True
+
+        print(f"Dropping refresh after {_refresh_failures} failures: {e}")
+        _refresh_failures = 0
+        _refresh_requested_at = None
+        return False
+
+    _refresh_failures = 0
+    end = time.monotonic_ns()
+    refresh_count += 1
+    refresh_blocked_ns += end - start
+    refresh_waited_ns += start - _refresh_requested_at
+    _refresh_requested_at = None
+    return False
 
 
 def _refresh_handler(os, message):
-    _refresh_display_save()
+    request_refresh()
 
 
 def _show_bitmap_handler(os, message):
@@ -51,33 +134,221 @@ def _show_bitmap(bitmap, palette):
     group = displayio.Group()
     group.append(tile_grid)
     board.DISPLAY.root_group = group
-    _refresh_display_save()
+    request_refresh()
 
 
 def _show_group(_, message):
     group = message.value
     board.DISPLAY.root_group = group
-    _refresh_display_save()
+    request_refresh()
 
 
 def _show_file_handler(os, message):
-    filename = message.value
-    if not filename.endswith('.b64'):
-        filename += '.b64'
+    filename = page_filename(message.value)
+    stored = _resolve_page(filename)
+
+    stamp = _file_stamp(stored)
+    cached = _cache.get(filename, stamp)
+    if cached:
+        bitmap, palette = cached
+    else:
+        data, width, height, colors = _read_page(stored)
+        bitmap, palette = _create_bitmap(width, height, colors)
+        bits.unpack_into(bitmap, data, width, height)
+        del data
+
+        _cache.put(filename, stamp, (bitmap, palette))
+
+    _show_bitmap(bitmap, palette)
+
+    os.messages.append(Message(zeos.MessageKey.INFO, f"File '{filename}' shown. "))
+
+
+class PageDecoder:
+    """Decodes a stored page a few rows at a time and puts it into the page cache once done.
+
+    Use it to decode pages ahead of time, without blocking the os for the whole decode."""
+
+    def __init__(self, filename):
+        self.filename = page_filename(filename)
+
+        self._stamp = None
+        self._data = None
+        self._width = 0
+        self._height = 0
+        self._bitmap = None
+        self._palette = None
+        self._row = None
+        self._y = 0
+
+    def step(self, rows: int) -> bool:
+        """Decode the next rows of the page. Returns True once the page is in the cache."""
+        if self._data is None:
+            return self._start()
+
+        end = min(self._y + rows, self._height)
+        bits.unpack_rows(self._bitmap, self._data, self._width, self._y, end, self._row)
+        self._y = end
+
+        if self._y < self._height:
+            return False
+
+        _cache.put(self.filename, self._stamp, (self._bitmap, self._palette))
+        self.cancel()
+        return True
+
+    def cancel(self):
+        self._data = None
+        self._bitmap = None
+        self._palette = None
+        self._row = None
+
+    def _start(self) -> bool:
+        stored = _resolve_page(self.filename)
+        self._stamp = _file_stamp(stored)
+        if _cache.contains(self.filename, self._stamp):
+            return True
+
+        self._data, self._width, self._height, colors = _read_page(stored)
+        self._bitmap, self._palette = _create_bitmap(self._width, self._height, colors)
+        self._row = bytearray(bits.row_bytes(self._width) * 8)
+        self._y = 0
+        return False
+
+
+PAGE_EXTENSION = '.zeb'
+LEGACY_PAGE_EXTENSION = '.b64'
+
+
+def page_filename(filename):
+    """The name a page is stored under, with or without any of the known extensions given."""
+    if filename.endswith(LEGACY_PAGE_EXTENSION):
+        filename = filename[:-len(LEGACY_PAGE_EXTENSION)]
+
+    if not filename.endswith(PAGE_EXTENSION):
+        filename += PAGE_EXTENSION
+
+    return filename
+
+
+def is_page(filename) -> bool:
+    return filename.endswith(PAGE_EXTENSION) or filename.endswith(LEGACY_PAGE_EXTENSION)
+
+
+def stored_pages():
+    """Names of all pages stored, sorted. Pages in the old format get migrated once they are shown."""
+    pages = []
+    for file in systemos.listdir('/'):
+        if file.endswith(PAGE_EXTENSION + '.tmp'):
+            # only the temporary file of a page survived a power cut while storing it
+            file = file[:-len('.tmp')]
+
+        if is_page(file):
+            name = page_filename(file)
+            if name not in pages:
+                pages.append(name)
+
+    pages.sort()
+    return pages
+
 
-    with open(filename, "rb") as file:
-        payload = file.read()
-        bitmap, palette = decode_serialized_bitmap(payload)
-        del payload
+def store_page(filename, payload, width=296, height=128, deflated=False):
+    """Decode a serialized (base64 of zlib) image once and store it as a page. Returns the name of the page.
 
-        _show_bitmap(bitmap, palette)
+    The payload is either the serialized image itself or a stream to read it from. With `deflated`,
+    it is the zlib compressed pixels of a binary upload, without base64 on top."""
+    data = _inflate_serialized(payload, bits.page_size(width, height), deflated)
 
-        os.messages.append(Message(zeos.MessageKey.INFO, f"File '{filename}' shown. "))
+    filename = page_filename(filename)
+    _write_page(filename, data, width, height)
+
+    _remove_legacy_page(filename)
+    invalidate_cached(filename)
+    return filename
+
+
+def delete_page(filename) -> bool:
+    """Delete a page, in whichever format it is stored."""
+    filename = page_filename(filename)
+    deleted = False
+    for stored in util.saved_files(filename):
+        deleted = util.remove(stored) or deleted
+    deleted = _remove_legacy_page(filename) or deleted
+    invalidate_cached(filename)
+    return deleted
+
+
+def invalidate_cached(filename):
+    """Forget the decoded page of the given file, call after the file got changed or removed."""
+    _cache.invalidate(page_filename(filename))
+
+
+def _resolve_page(filename):
+    # find the file on disk of the page, migrating an old page if possible.
+    for stored in util.saved_files(filename):
+        if _file_exists(stored):
+            return stored
+
+    legacy = _legacy_filename(filename)
+    if not _file_exists(legacy):
+        raise OSError(f"No page '{filename}' stored.")
+
+    try:
+        with open(legacy, "rb") as file:
+            data = _inflate_serialized(file, bits.page_size(296, 128))
+
+        _write_page(filename, data, 296, 128)
+    except OSError:
+        # read only file system (developer mode?), keep using the old page
+        return legacy
+
+    # only now the new page is complete, the old one can go
+    _remove_legacy_page(filename)
+    invalidate_cached(filename)
+    print(f"Migrated '{legacy}' to '{filename}'.")
+    return filename
+
+
+def _write_page(filename, data, width, height):
+    util.write_atomically(filename, lambda file: bits.write_page(file, data, width, height))
+
+
+def _read_page(stored):
+    if stored.endswith(LEGACY_PAGE_EXTENSION):
+        with open(stored, "rb") as file:
+            data = _inflate_serialized(file, bits.page_size(296, 128))
+
+        return data, 296, 128, (0x000000, 0xFFFFFF)
+
+    with open(stored, "rb") as file:
+        return bits.read_page(file)
+
+
+def _remove_legacy_page(filename) -> bool:
+    return util.remove(_legacy_filename(filename))
+
+
+def _legacy_filename(filename):
+    return filename[:-len(PAGE_EXTENSION)] + LEGACY_PAGE_EXTENSION
+
+
+def _file_exists(filename) -> bool:
+    try:
+        systemos.stat(filename)
+        return True
+    except OSError:
+        return False
+
+
+def _file_stamp(filename):
+    stat = systemos.stat(filename)
+    # size and modification time
+    return stat[6], stat[8]
 
 
 def _show_terminal_handler(os, message):
     board.DISPLAY.root_group = displayio.CIRCUITPYTHON_TERMINAL
-    _refresh_display_save()
+    request_refresh()
 
 
 def draw_intro():
@@ -88,26 +359,77 @@ def draw_intro():
     # splash.append(splash_tiles)
     # display.root_group = splash
 
-    _refresh_display_save()
+    request_refresh()
+
+
+def decode_serialized_bitmap(payload, width=296, height=128, deflated=False):
+    binarized_bytes = _inflate_serialized(payload, bits.page_size(width, height), deflated)
+
+    bitmap, palette = _create_bitmap(width, height)
+    bits.unpack_into(bitmap, binarized_bytes, width, height)
+
+    return bitmap, palette
+
+
+def _inflate_serialized(payload, size, deflated=False):
+    # base64 decode and inflate the payload, or a stream of it.
+    #
+    # zlib of CircuitPython only inflates whole buffers, so the deflated pixels have to be in
+    # memory at once. the base64 text gets decoded block by block straight into a buffer sized
+    # for the biggest deflate output of `size` bytes, so neither the text nor copies of the
+    # decoded bytes are kept around next to it.
+    if not deflated:
+        payload = _decode_base64(payload, _deflate_bound(size))
+
+    data = zlib.decompress(payload)
+    if len(data) < size:
+        raise ValueError(f"Expected {size} bytes of pixels, got {len(data)}.")
+
+    return data
+
+
+# base64 characters decoded in one go
+_BASE64_BLOCK = 512
+
+
+def _decode_base64(payload, capacity):
+    decoded = bytearray(capacity)
+    view = memoryview(decoded)
+    decoder = base64.B64Decoder()
+
+    filled = 0
+    for block in _base64_blocks(payload):
+        available = decoder.feed(block)
+        if filled + available > capacity:
+            raise ValueError(f"Expected at most {capacity} bytes of deflated pixels.")
+
+        filled += decoder.readinto(view[filled:filled + available])
+
+    decoder.finish()
+    return view[:filled]
+
+
+def _base64_blocks(payload):
+    if hasattr(payload, 'read'):
+        block = payload.read(_BASE64_BLOCK)
+        while block:
+            yield block
+            block = payload.read(_BASE64_BLOCK)
+    else:
+        for start in range(0, len(payload), _BASE64_BLOCK):
+            yield payload[start:start + _BASE64_BLOCK]
+
 
+def _deflate_bound(size):
+    # zlib's compressBound: the most bytes deflating `size` bytes can take
+    return size + (size >> 12) + (size >> 14) + (size >> 25) + 13
 
-def decode_serialized_bitmap(payload, width=296, height=128):
-    compressed_bytes = base64.b64decode(payload)
-    binarized_bytes = zlib.decompress(compressed_bytes)
 
+def _create_bitmap(width, height, colors=(0x000000, 0xFFFFFF)):
     bitmap = displayio.Bitmap(width, height, 2)
 
     palette = displayio.Palette(2)
-    palette[0] = 0x000000
-    palette[1] = 0xFFFFFF
-
-    for y in range(height):
-        print("B", end="")
-        for x in range(width):
-            # Pretend you understand this part
-            byte_index = (y * (width // 8)) + (x // 8)
-            bit_index = 7 - (x % 8)
-            pixel_value = (binarized_bytes[byte_index] >> bit_index) & 1
-            bitmap[x, y] = pixel_value
+    palette[0] = colors[0]
+    palette[1] = colors[1]
 
     return bitmap, palette
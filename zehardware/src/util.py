@@ -1,3 +1,4 @@
+import os as systemos
 import traceback
 
 
@@ -10,3 +11,41 @@ def exception_to_readable(exception) -> str:
     result += "\n"
     result += "\n  ".join(trace)
     return result
+
+
+def read_only() -> bool:
+    """tell if the file system belongs to the computer (developer mode), so writes would fail."""
+    try:
+        import storage
+        return storage.getmount('/').readonly
+    except (ImportError, OSError):
+        return False
+
+
+def write_atomically(filename, write, mode='wb'):
+    """call write(file) on a temporary file, then put it in place of filename.
+
+    a crash never leaves a half written file behind: at worst only the temporary file is left,
+    see `saved_files`. raises OSError if the file could not be written."""
+    temporary = filename + '.tmp'
+    with open(temporary, mode) as file:
+        write(file)
+
+    remove(filename)
+    systemos.rename(temporary, filename)
+
+
+def saved_files(filename):
+    """names to read a file written by `write_atomically` from, in order.
+
+    a crash between removing the old file and renaming the new one leaves only the temporary file."""
+    return filename, filename + '.tmp'
+
+
+def remove(filename) -> bool:
+    """remove filename, tell if it was there."""
+    try:
+        systemos.remove(filename)
+        return True
+    except OSError:
+        return False
@@ -1,10 +1,11 @@
-import re
 import time
 
 import board
 import busio
 import microcontroller
 
+from httpreader import HttpReader
+from httpreader import HttpResponse
 from message import Message
 
 
@@ -19,6 +20,37 @@ class MessageKey:
     POST_RESULT = "POST_RESULT"
 
 
+# how often the module gets asked for new bytes while an operation runs and while not, in seconds
+_POLL_INTERVAL = 0.05
+_IDLE_POLL_INTERVAL = 0.2
+
+# how the module ends its answers
+OK = b'\nOK\r\n'
+ERROR = b'\nERROR\r\n'
+FAIL = b'\nFAIL\r\n'
+SEND_OK = b'SEND OK\r\n'
+SEND_FAIL = b'SEND FAIL\r\n'
+PROMPT = b'>'
+CLOSED = b'CLOSED\r\n'
+
+# how long to wait for an answer, in seconds
+_COMMAND_TIMEOUT = 2.0
+_SCAN_TIMEOUT = 10.0
+_JOIN_TIMEOUT = 20.0
+_CONNECT_TIMEOUT = 10.0
+
+# how long the networks found stay valid, in seconds
+_SCAN_TTL = 60
+
+# seconds to wait before joining a lost network again, doubled after every failed try
+_RECONNECT_MIN = 2
+_RECONNECT_MAX = 120
+
+# what the module tells without being asked
+_DISCONNECTED = b'WIFI DISCONNECT'
+_GOT_IP = b'WIFI GOT IP'
+
+
 class Network:
     def __init__(self, ssid, mac, strength):
         self.ssid = ssid
@@ -29,14 +61,19 @@ class Network:
         return f"{self.ssid}@{self.mac}:{self.strength}"
 
 
-class HttpResponse:
-    def __init__(self, status, headers, body):
-        self.status = status
-        self.headers = headers
-        self.body = body
+class Command:
+    # one AT command in flight: done once one of the terminators arrived, or, with a `reader`,
+    # once the reader got all it needs. A reader gets every byte arriving for the command as it
+    # arrives, and is what the command answers with; `timeout` then counts from the last byte.
 
-    def __str__(self):
-        return f"{self.status} {self.headers}\n{self.body}"
+    def __init__(self, text, terminators=(OK, ERROR), timeout: float = _COMMAND_TIMEOUT, reader=None):
+        self.text = text
+        self.terminators = terminators
+        self.timeout = timeout
+        self.reader = reader
+
+    def __repr__(self):
+        return f"Command({self.text!r})"
 
 
 class ZeWifi:
@@ -45,16 +82,51 @@ class ZeWifi:
     # Please "deinit" the I2C on the badger if used for the first time.
     # The module attached needs to speak AT commands, and this class encapsulates those
     # into nice little methods.
+    #
+    # Nothing here waits for the module: every method queues an operation and returns.
+    # Operations are generators yielding the `Command`s to send, getting the bytes answered
+    # (or None on a timeout) back. `poll`, called regularly, sends them one after the other,
+    # collects the answers as they arrive and hands the result of every operation to its callback.
+    #
+    # The tcp connection of a request stays open for the next one to the same server (http
+    # keep-alive), and gets opened again if the server closed it in between.
+    #
+    # The network joined is remembered: connecting to it again costs nothing, scans are reused
+    # for `scan_ttl` seconds, and a network lost gets joined again, waiting longer after every
+    # failed try.
 
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, scan_ttl: float = _SCAN_TTL):
         self.verbose = verbose
+        self.scan_ttl = scan_ttl
         self.uart = busio.UART(
             microcontroller.pin.GPIO4,
             microcontroller.pin.GPIO5,
             baudrate=115200,
+            timeout=0,
             receiver_buffer_size=2048
         )
 
+        # (operation, callback) waiting for their turn
+        self._operations = []
+        self._operation = None
+        self._callback = None
+
+        self._command = None
+        self._deadline = 0.0
+        self._received = b''
+
+        # (ip, port) of the open tcp connection
+        self._link = None
+
+        # ssid of the network joined, and how to join it again
+        self.joined = None
+        self._credentials = None
+        self._reconnect_at = None
+        self._backoff = _RECONNECT_MIN
+
+        self._networks = None
+        self._scanned_at = 0.0
+
     def deinit(self):
         self.uart.deinit()
 
@@ -62,9 +134,161 @@ class ZeWifi:
         if self.verbose:
             print(message)
 
-    def scan(self) -> map[str:list[Network]] | None:
-        self.uart.write('AT+CWLAP\r\n')
-        response = self.uart.read()
+    def busy(self) -> bool:
+        return self._operation is not None or len(self._operations) > 0
+
+    def submit(self, operation, callback=None):
+        self._operations.append((operation, callback))
+
+    def execute(self, operation):
+        # run one operation to its end, blocking: only meant for booting
+        results = []
+        self.submit(operation, results.append)
+        while not results:
+            self.poll()
+            time.sleep(_POLL_INTERVAL)
+
+        return results[0]
+
+    def poll(self):
+        if self._operation is None:
+            self._drain()
+            if not self._operations:
+                if self._reconnect_at is not None and time.monotonic() >= self._reconnect_at:
+                    self._reconnect_at = None
+                    self.submit(self._connect(*self._credentials), self._reconnected)
+                return
+
+            self._operation, self._callback = self._operations.pop(0)
+            self._advance(None)
+
+        if self._command is None:
+            return
+
+        command = self._command
+        waiting = self.uart.in_waiting
+        now = time.monotonic()
+        if waiting:
+            if command.reader:
+                command.reader.feed(self.uart.read(waiting))
+                self._deadline = now + command.timeout
+            else:
+                self._received += self.uart.read(waiting)
+
+        response = self._complete()
+        if response is not None:
+            if not command.reader:
+                self._track(response)
+            self._advance(response)
+        elif now >= self._deadline:
+            self.log(f"Timeout: {self._command} got {self._received}.")
+            self._received = b''
+            self._advance(None)
+
+    def _drain(self):
+        # nobody waits for what arrives in between, but it might tell that the server hung up
+        waiting = self.uart.in_waiting
+        if waiting:
+            self._received += self.uart.read(waiting)
+
+        if CLOSED in self._received:
+            self._link = None
+
+        self._track(self._received)
+        self._received = b''
+
+    def _track(self, received):
+        # lost the network? get it back in the background
+        disconnected = received.rfind(_DISCONNECTED)
+        if disconnected >= 0 and received.rfind(_GOT_IP) < disconnected:
+            self.log("Wifi lost.")
+            self._lost()
+
+    def _lost(self):
+        self.joined = None
+        self._link = None
+        if self._credentials and self._reconnect_at is None:
+            self._reconnect_at = time.monotonic() + self._backoff
+
+    def _reconnected(self, joined):
+        if joined:
+            self._backoff = _RECONNECT_MIN
+        else:
+            self._backoff = min(self._backoff * 2, _RECONNECT_MAX)
+            self._reconnect_at = time.monotonic() + self._backoff
+
+    def _complete(self):
+        # the answer of the current command, if it arrived completely
+        command = self._command
+        if command.reader:
+            if not command.reader.done:
+                return None
+
+            self._received = command.reader.rest
+            return command.reader
+
+        received = self._received
+        for terminator in command.terminators:
+            end = received.find(terminator)
+            if end >= 0:
+                end += len(terminator)
+                self._received = received[end:]
+                return received[:end]
+
+        return None
+
+    def _advance(self, response):
+        # hand the answer to the operation, and send whatever it asks for next
+        try:
+            if response is None and self._command is None:
+                command = next(self._operation)
+            else:
+                command = self._operation.send(response)
+        except StopIteration as stop:
+            self._finish(stop.value)
+            return
+        except Exception as e:
+            print(f"Wifi operation failed: {e}")
+            self._finish(None)
+            return
+
+        self._command = command
+        self._deadline = time.monotonic() + command.timeout
+        if command.reader and self._received:
+            # arrived together with the answer before
+            command.reader.feed(self._received)
+            self._received = b''
+
+        if command.text:
+            self.log(f"> {command.text}")
+            self.uart.write(command.text)
+
+    def _finish(self, result):
+        callback = self._callback
+        self._operation = None
+        self._callback = None
+        self._command = None
+
+        if callback:
+            callback(result)
+
+    def probe(self):
+        # operation: is there a module answering at all?
+        response = yield Command('AT\r\n')
+        return _succeeded(response)
+
+    def scan(self, callback):
+        self.submit(self._scan(), callback)
+
+    def _cached_scan(self):
+        if self._networks and time.monotonic() - self._scanned_at < self.scan_ttl:
+            return self._networks
+
+        networks = yield from self._scan()
+        return networks
+
+    def _scan(self):
+        response = yield Command('AT+CWLAP\r\n', timeout=_SCAN_TIMEOUT)
 
         if response and len(response) > 0:
             response = response.decode()
@@ -82,121 +306,184 @@ class ZeWifi:
                     result[x.ssid].append(x)
                 else:
                     result[x.ssid] = [x]
+
+            self._networks = result
+            self._scanned_at = time.monotonic()
             return result
         else:
             return None
 
-    def connect(self, ssid: str, pwd: str) -> bool:
-        available_networks = self.scan()
-        if not available_networks:
-            available_networks = self.scan()
+    def connect(self, ssid: str, pwd: str, callback):
+        self.submit(self._connect(ssid, pwd), callback)
+
+    def _connect(self, ssid: str, pwd: str):
+        if self.joined == ssid:
+            return True
+
+        # joined already, before a reboot of the badge for example?
+        if (yield from self._joined_network()) == ssid:
+            self._joined(ssid, pwd)
+            return True
+
+        available_networks = yield from self._cached_scan()
+        if not available_networks or ssid not in available_networks:
+            available_networks = yield from self._scan()
 
         if available_networks and ssid in available_networks:
             found = sorted(available_networks[ssid], key=lambda x: x.strength)[-1]
 
-            self.uart.write(f'AT+CWJAP_CUR="{found.ssid}","{pwd}","{found.mac}"\r\n')
-            response = self.uart.read()
+            response = yield Command(
+                f'AT+CWJAP_CUR="{found.ssid}","{pwd}","{found.mac}"\r\n',
+                terminators=(OK, ERROR, FAIL),
+                timeout=_JOIN_TIMEOUT,
+            )
 
-            if len(response) <= 0 or "WIFI CONNECTED" not in response.decode():
+            if not response or "WIFI CONNECTED" not in response.decode():
                 print(f"Not connected, couldn't get IP. Response was '{response}'.")
                 return False
             else:
+                self._joined(ssid, pwd)
                 return True
         else:
-            print(f"Network '{ssid}' was not found. These are available: '{"' ".join(available_networks.keys())}'.")
+            available = "' '".join(available_networks.keys()) if available_networks else ''
+            print(f"Network '{ssid}' was not found. These are available: '{available}'.")
             return False
 
-    def _http_method(self, method: str, ip: str, url: str, host: str = "", port: int = 80,
-                     body: str = "") -> HttpResponse | None:
-        response = ""
-        while len(response) == 0 or "STATUS:3" not in response.decode():
-            # connect to ip
-            self.uart.write(f'AT+CIPSTART="TCP","{ip}",{port}\r\n')
-            response = self.uart.read()
-            if len(response) <= 0 or "OK" not in response.decode():
-                print(f"Couldn't connect: Response was '{response}'.")
-                return None
+    def _joined(self, ssid: str, pwd: str):
+        self.joined = ssid
+        self._credentials = (ssid, pwd)
+        self._reconnect_at = None
+        self._backoff = _RECONNECT_MIN
 
-            # check status
-            self.uart.write('AT+CIPSTATUS\r\n')
-            response = self.uart.read()
+    def _joined_network(self):
+        # ssid of the network the module is in and got an ip from, None if it isn't
+        response = yield Command('AT+CWJAP?\r\n')
+        if not _succeeded(response) or b'+CWJAP:"' not in response:
+            return None
+
+        start = response.find(b'+CWJAP:"') + len(b'+CWJAP:"')
+        ssid = response[start:response.find(b'"', start)].decode()
+
+        response = yield Command('AT+CIPSTA?\r\n')
+        if not _succeeded(response) or b'ip:"' not in response:
+            return None
 
+        start = response.find(b'ip:"') + len(b'ip:"')
+        ip = response[start:response.find(b'"', start)]
+        return ssid if ip and ip != b'0.0.0.0' else None
+
+    def _http_method(self, method: str, ip: str, url: str, host: str = "", port: int = 80,
+                     body: str = "", on_body=None, headers=None):
         # create http payload
         payload = (f"{method} {url} HTTP/1.1\r\n" +
                    f"Host: {ip}:{port}\r\n" +
                    f"User-Agent: ZeBadge/0.1337.0\r\n" +
                    f"Accept: */*\r\n")
 
+        if headers:
+            for key in headers:
+                payload += f"{key}: {headers[key]}\r\n"
+
         if len(body) > 0:
             payload += (f"Content-type: application/json\r\n" +
                         f"Content-Length: {len(body)}\r\n")
 
         payload += f"\r\n{body}"
 
-        self.uart.write(f'AT+CIPSEND={len(payload)}\r\n')
-        self.uart.read()
+        # reuse the connection of the last request, open it again if it got closed meanwhile
+        response = None
+        for _ in range(2):
+            if self._link != (ip, port):
+                connected = yield from self._open(ip, port)
+                if not connected:
+                    return None
 
-        self.uart.write(payload)
-        response = self.uart.read()
+            response = yield Command(f'AT+CIPSEND={len(payload)}\r\n', terminators=(PROMPT, ERROR))
+            if response and PROMPT in response:
+                break
 
-        if len(response) >= 0:
-            response = self._parse_response(response.decode())
+            # link is not valid
+            self._link = None
         else:
-            response = None
+            print(f"Couldn't send: Response was '{response}'.")
+            return None
 
-        # closing
-        self.uart.write("AT+CIPCLOSE\r\n")
-        self.uart.read()
+        response = yield Command(payload, terminators=(SEND_OK, SEND_FAIL, ERROR))
+        if not response or SEND_OK not in response:
+            print(f"Couldn't send: Response was '{response}'.")
+            yield from self._close()
+            return None
 
-        return response
+        # the response arrives in +IPD packets, parsed while it does
+        reader = yield Command(None, terminators=(), timeout=_CONNECT_TIMEOUT, reader=HttpReader(on_body))
 
-    def _parse_response(self, response: str) -> HttpResponse | None:
-        # replace / ignore length statements
-        response = re.sub(r'\+IPD,[0-9]+:', '', response)
+        if not reader or reader.error:
+            print(f"Couldn't receive: {reader.error if reader else 'timeout'}.")
+            yield from self._close()
+            return None
 
-        parts = response.replace('\r\n', '\n').splitlines()
-        self.log(f'parts: ')
-        for i, p in enumerate(parts):
-            self.log(f'  {i:02d}: {p}')
+        if reader.closed:
+            self._link = None
 
-        meta_parts = parts[:5]
-        self.log(f'meta: {meta_parts}')
+        response = reader.response()
+        self.log(response)
+        return response
 
-        http_parts = parts[5:]
-        http_code, status_code = http_parts.pop(0).strip().split()
+    def _open(self, ip: str, port: int):
+        if self._link:
+            yield from self._close()
 
-        status_code = int(status_code)
-        self.log(f'code {status_code}')
+        response = yield Command(
+            f'AT+CIPSTART="TCP","{ip}",{port}\r\n',
+            terminators=(OK, ERROR),
+            timeout=_CONNECT_TIMEOUT,
+        )
 
-        headers = {}
-        header_separator_index = -1
-        for index, header in enumerate(http_parts):
-            if header == '':
-                header_separator_index = index
-                break
+        if response and b'ALREADY CONNECTED' in response:
+            # left open, but not by us: start over
+            yield Command("AT+CIPCLOSE\r\n")
+            response = yield Command(
+                f'AT+CIPSTART="TCP","{ip}",{port}\r\n',
+                terminators=(OK, ERROR),
+                timeout=_CONNECT_TIMEOUT,
+            )
 
-            key, value = header.split(":", 1)
-            key = key.strip()
-            value = value.strip()
+        if not response or OK not in response:
+            print(f"Couldn't connect: Response was '{response}'.")
+            if response and b'no ip' in response:
+                self._lost()
+            return False
 
-            # nope, keep iterating through headers
-            headers[key] = value.strip()
+        self._link = (ip, port)
+        return True
 
-        body = "".join(http_parts[header_separator_index:])
-        response = HttpResponse(status_code, headers, body)
-        self.log(response)
-        return response
+    def _close(self):
+        self._link = None
+        yield Command("AT+CIPCLOSE\r\n")
+
+    def http_get(self, ip: str, url: str, host: str = "", port: int = 80, callback=None, on_body=None,
+                 headers=None):
+        # on_body gets the body piece by piece, instead of it being collected in the response.
+        # headers are sent on top of the usual ones, like {'If-None-Match': etag}.
+        self.submit(self._http_method("GET", ip, url, host, port, on_body=on_body, headers=headers), callback)
 
-    def http_get(self, ip: str, url: str, host: str = "", port: int = 80) -> HttpResponse | None:
-        return self._http_method("GET", ip, url, host, port)
+    def http_post(self, ip: str, url: str, host: str = "", port: int = 80, body: str = "", callback=None,
+                  on_body=None, headers=None):
+        self.submit(self._http_method("POST", ip, url, host, port, body, on_body, headers), callback)
 
-    def http_post(self, ip: str, url: str, host: str = "", port: int = 80, body: str = "") -> HttpResponse | None:
-        return self._http_method("POST", ip, url, host, port, body)
+
+def _succeeded(response) -> bool:
+    return response is not None and OK in response
 
 
 wifi = None
 
 
+def connected() -> bool:
+    # joined a network, requests can go out right away
+    return wifi is not None and wifi.joined is not None
+
+
 def init(os) -> bool:
     global wifi
     # disconnect the i2c, make it a UART
@@ -204,50 +491,52 @@ def init(os) -> bool:
     board.I2C().deinit()
     time.sleep(0.4)
 
-    wifi = ZeWifi()
+    wifi = ZeWifi(scan_ttl=os.config.get('wifi.scan.ttl', _SCAN_TTL))
 
-    scan = wifi.scan()
-    if not scan:
-        scan = wifi.scan()
+    found = wifi.execute(wifi.probe())
+    if not found:
+        # maybe still booting
+        found = wifi.execute(wifi.probe())
 
-    if scan:
-        os.subscribe(MessageKey.SCAN, lambda _, message: os.messages.append(
-            Message(MessageKey.SCAN_RESULT, wifi.scan())))
+    if found:
+        os.add_task(_update_wifi, _POLL_INTERVAL, idle_interval=_IDLE_POLL_INTERVAL)
 
-        os.subscribe(MessageKey.CONNECT, lambda _, message: os.messages.append(
-            Message(
-                MessageKey.CONNECT_RESULT,
-                wifi.connect(
-                    message.value['ssid'],
-                    message.value['pwd']
-                )
-            )
+        def post(key):
+            return lambda result: os.messages.append(Message(key, result))
+
+        os.subscribe(MessageKey.SCAN, lambda _, message: wifi.scan(post(MessageKey.SCAN_RESULT)))
+
+        os.subscribe(MessageKey.CONNECT, lambda _, message: wifi.connect(
+            message.value['ssid'],
+            message.value['pwd'],
+            post(MessageKey.CONNECT_RESULT),
         ))
 
-        os.subscribe(MessageKey.GET, lambda _, message: os.messages.append(
-            Message(
-                MessageKey.GET_RESULT,
-                wifi.http_get(
-                    message.value['ip'],
-                    message.value['url'],
-                    message.value['host'],
-                    message.value['port']
-                )
-            )
+        os.subscribe(MessageKey.GET, lambda _, message: wifi.http_get(
+            message.value['ip'],
+            message.value['url'],
+            message.value['host'],
+            message.value['port'],
+            callback=post(MessageKey.GET_RESULT),
+            headers=message.value.get('headers'),
         ))
 
-        os.subscribe(MessageKey.POST, lambda _, message: os.messages.append(
-            Message(
-                MessageKey.POST_RESULT,
-                wifi.http_post(
-                    message.value['ip'],
-                    message.value['url'],
-                    message.value['host'],
-                    message.value['port'],
-                    message.value['body'],
-                )
-            )
+        os.subscribe(MessageKey.POST, lambda _, message: wifi.http_post(
+            message.value['ip'],
+            message.value['url'],
+            message.value['host'],
+            message.value['port'],
+            message.value['body'],
+            callback=post(MessageKey.POST_RESULT),
+            headers=message.value.get('headers'),
         ))
         return True
     else:
+        wifi.deinit()
+        wifi = None
         return False
+
+
+def _update_wifi(os) -> bool:
+    wifi.poll()
+    return wifi.busy()
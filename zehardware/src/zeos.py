@@ -1,24 +1,48 @@
-import os as systemos
+import gc
+import sys
 import time
 import traceback
 
 import board
+import keypad
+import supervisor
 import usb_cdc
 from digitalio import DigitalInOut
 from digitalio import Direction
-from digitalio import Pull
 
 import serial
 import ui
-from app_developer_idle_clicker import DeveloperIdleClickerApp
-from app_store_and_show import StoreAndShowApp
-from app_zealterego import ZeAlterEgoApp
-from app_zepass import ZePassApp
+from config import Config
 from config import fields_to_str
-from config import load_config
-from config import save_config
 from config import update_config
 from message import Message
+from message import MessageQueue
+from message import Priority
+from message import obtain
+from message import recycle
+from stats import Stats
+from subscriptions import Subscriptions
+
+
+# how often buttons get polled while in use, and the TICK timer fires by default, in seconds. Idle
+# buttons don't get polled, pressing one wakes the os.
+_BUTTONS_INTERVAL = 0.02
+_TICK_INTERVAL = 1.0
+
+# how often the os looks for input waiting for a task while sleeping, in seconds
+_INPUT_CHECK_INTERVAL = 0.02
+
+# idle interval of tasks only running after being woken
+NEVER = float('inf')
+
+# tasks due this close to each other get run together, so the badge wakes up once for them
+_TASK_SLACK = 0.01
+
+# free memory (bytes) below which apps not running get unloaded
+_APPS_WATERMARK = 32 * 1024
+
+_TICKS_MAX = (1 << 29) - 1
+_TICKS_HALF_PERIOD = 1 << 28
 
 
 class MessageKey:
@@ -32,6 +56,7 @@ class MessageKey:
     CONFIG_UPDATE = "config_update"
     CONFIG_LIST = "config_list"
     BUTTON_CHANGED = "button_changed"
+    BUTTON_EVENT = "button_event"
 
 
 class ZeBadgeOs:
@@ -40,15 +65,29 @@ class ZeBadgeOs:
     #
     # is it overengineered, yes.
 
-    next_subscription_id = 0
-
     def __init__(self):
         # create the os
+        boot_start = time.monotonic()
 
         # fields
         self.tasks = []
-        self.subscribers = {}
-        self.messages = []
+        self.subscribers = Subscriptions()
+        self.messages = MessageQueue(
+            priorities={
+                MessageKey.BUTTON_CHANGED: Priority.INPUT,
+                MessageKey.BUTTON_EVENT: Priority.INPUT,
+                serial.MessageKey.RECEIVED: Priority.INPUT,
+                serial.MessageKey.RECEIVED_BINARY: Priority.INPUT,
+                ui.MessageKey.SHOW_GROUP: Priority.DISPLAY,
+                ui.MessageKey.SHOW_BITMAP: Priority.DISPLAY,
+                ui.MessageKey.SHOW_FILE: Priority.DISPLAY,
+                ui.MessageKey.SHOW_TERMINAL: Priority.DISPLAY,
+                ui.MessageKey.REFRESH: Priority.DISPLAY,
+                MessageKey.TICK: Priority.IDLE,
+            },
+            # only the last one of these matters
+            coalesced=(ui.MessageKey.SHOW_FILE, ui.MessageKey.SHOW_GROUP, ui.MessageKey.REFRESH),
+        )
         self.active_app = None
 
         self.led = DigitalInOut(board.USER_LED)
@@ -57,70 +96,86 @@ class ZeBadgeOs:
         self.led_on = False
 
         self.buttons = SystemButtons()
-        self.tasks.append(_update_system_buttons)
+        self.add_task(_update_system_buttons, _BUTTONS_INTERVAL, idle_interval=NEVER, ready=self.buttons.ready)
         self._reset_subscribers()
         self._subscribe_to_system_buttons()
 
         # add defaults
-        self.config = {}
-        load_config(self.config)
+        self.config = Config()
+        self.config.load()
+
+        self.add_timer(MessageKey.TICK, self.config.get('os.tick.interval', _TICK_INTERVAL))
+        self.buttons.long_press = self.config.get('buttons.long_press', self.buttons.long_press)
+        self.buttons.repeat = self.config.get('buttons.repeat', self.buttons.repeat)
+
+        # timings of tasks and subscribers, see `stats` serial command
+        self.stats = Stats() if self.config.get('os.stats', False) else None
 
         self._init_interfaces()
 
         # applications
-        self._app_a = None
-        self._app_b = None
-        self._app_c = None
+        self._apps = {}
+        self._app_instances = {}
         self._init_apps()
 
         self.system_subscribers = self.subscribers.copy()
 
+        gc.collect()
+        self.boot_time = time.monotonic() - boot_start
+        self.boot_free = gc.mem_free() if hasattr(gc, 'mem_free') else 0
+        self.messages.append(Message(MessageKey.INFO, self.boot_report()))
+
+    def boot_report(self) -> str:
+        return f"booted in {int(self.boot_time * 1000)}ms, {self.boot_free} bytes free after boot"
+
     def _reset_subscribers(self):
         self.subscribers.clear()
 
         # add default subscriptions
         self.subscribe(serial.MessageKey.RECEIVED, _serial_received_handler)
+        self.subscribe(serial.MessageKey.RECEIVED_BINARY, _serial_binary_received_handler)
 
+        self.subscribe(MessageKey.TICK, _tick_handler)
         self.subscribe(MessageKey.INFO, _info_handler)
         self.subscribe(MessageKey.ERROR, _error_handler)
         self.subscribe(MessageKey.RELOAD, _reload_handler)
         self.subscribe(MessageKey.EXIT, _exit_handler)
 
-        self.subscribe(MessageKey.CONFIG_LOAD, lambda os, message: load_config(self.config))
-        self.subscribe(MessageKey.CONFIG_SAVE, lambda os, message: save_config(self.config))
+        self.subscribe(MessageKey.CONFIG_LOAD, lambda os, message: self.config.load())
+        self.subscribe(MessageKey.CONFIG_SAVE, lambda os, message: self.config.save())
         self.subscribe(MessageKey.CONFIG_UPDATE, lambda os, message: update_config(self.config, message.value))
         self.subscribe(MessageKey.CONFIG_LIST,
                        lambda os, message: self.messages.append(
                            Message(serial.MessageKey.RESPOND, fields_to_str(self.config)))
                        )
 
+    def add_task(self, function, interval: float = 0.0, name: str = None, idle_interval: float = None,
+                 ready=None):
+        # call function(os) every interval seconds, or whenever the os wakes up for an interval of 0.
+        #
+        # with an idle_interval, function(os) returns whether it is busy: the task is called every
+        # interval seconds while it is, every idle_interval seconds while not. Task.wake() runs it
+        # right away, for tasks sleeping until something happens (idle_interval of NEVER). ready()
+        # tells whether input is waiting for the task, the os then wakes it while sleeping.
+        task = Task(function, interval, name, idle_interval, ready)
+        self.tasks.append(task)
+        return task
+
+    def add_timer(self, topic: str, interval: float):
+        # post an empty message on topic every interval seconds, always the same one.
+        message = Message(topic)
+        return self.add_task(lambda os: os.messages.append(message), interval, f"timer:{topic}")
+
     def subscribe(self, topic: str, subscriber) -> int:
         # subscribe a callback to a topic. Return an id for deletion.
-
-        if topic not in self.subscribers:
-            self.subscribers[topic] = {}
-
-        subscription_id = ZeBadgeOs.next_subscription_id
-        ZeBadgeOs.next_subscription_id += 1
-
-        self.subscribers[topic][subscription_id] = subscriber
-        return subscription_id
+        return self.subscribers.subscribe(topic, subscriber)
 
     def unsubscribe(self, subscription_id):
-        found = None
-
-        for topic in self.subscribers:
-            if subscription_id in self.subscribers[topic]:
-                found = self.subscribers[topic][subscription_id]
-                del self.subscribers[topic][subscription_id]
-
-            if len(self.subscribers[topic]) == 0:
-                del self.subscribers[topic]
-
-        return found is not None
+        # safe to call from inside a subscriber, the removed one won't be called anymore.
+        return self.subscribers.unsubscribe(subscription_id)
 
     def get_stored_files(self):
-        return list(filter(lambda x: x.endswith('b64'), systemos.listdir('/')))
+        return ui.stored_pages()
 
     def run(self):
         # start os, never returning unless exception wasn't caught
@@ -128,30 +183,78 @@ class ZeBadgeOs:
             print(task)
 
         while True:
-            try:
-                for task in self.tasks:
-                    task(self)
-
-                print('.', end='')
-
-                current_messages = self.messages.copy()
-                current_messages += [Message(MessageKey.TICK, None)]
-                self.messages.clear()
+            self.step()
+
+            if not self.messages:
+                self.sleep()
+
+    def step(self):
+        # run the tasks due and dispatch all messages queued so far, once.
+        try:
+            stats = self.stats
+            now = time.monotonic()
+            due = now + _TASK_SLACK
+            for task in self.tasks:
+                if due >= task.deadline:
+                    task.deadline = now + task.interval
+                    if stats:
+                        busy = stats.measure(task.name, task.function, self)
+                    else:
+                        busy = task.function(self)
+
+                    if not busy:
+                        task.deadline = now + task.idle_interval
+
+            messages = self.messages
+            current_messages = messages.take()
+
+            if stats:
+                stats.queue_depth(sum(len(level) for level in current_messages))
+
+            topics = self.subscribers.topics
+            index = self.subscribers.index
+            for level in current_messages:
+                for message in level:
+                    if not messages.dispatchable(message):
+                        recycle(message)
+                        continue
+
+                    for subscriber_id, subscriber in topics.get(message.topic, ()):
+                        # unsubscribed by an earlier subscriber of this message?
+                        if subscriber_id in index:
+                            if stats:
+                                stats.measure(_subscriber_name(message.topic, subscriber_id, subscriber),
+                                              subscriber, self, message)
+                            else:
+                                subscriber(self, message)
+
+                    recycle(message)
+
+        except Exception as e:
+            traceback.print_exception(e)
+
+    def sleep(self, until: float = NEVER):
+        # nothing left to do: sleep until the next task is due, input is waiting for a task, or until.
+        deadline = min(self.next_deadline(), until)
+        while True:
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                return
 
-                for message in current_messages:
-                    if message.topic in self.subscribers:
-                        subscriber_ids = self.subscribers[message.topic]
-                        for subscriber_id in subscriber_ids:
-                            subscriber = subscriber_ids[subscriber_id]
-                            subscriber(self, message)
+            time.sleep(min(delay, _INPUT_CHECK_INTERVAL))
 
-                self.led_on = not self.led_on
-                self.led.value = self.led_on
+            for task in self.tasks:
+                if task.ready and task.ready():
+                    task.wake()
+                    return
 
-            except Exception as e:
-                traceback.print_exception(e)
+    def next_deadline(self) -> float:
+        deadline = None
+        for task in self.tasks:
+            if deadline is None or task.deadline < deadline:
+                deadline = task.deadline
 
-            time.sleep(0.2)
+        return deadline if deadline is not None else time.monotonic() + _TICK_INTERVAL
 
     def _init_interfaces(self):
         # init always on tasks
@@ -193,17 +296,38 @@ class ZeBadgeOs:
         self.config["developer.mode"] = not (usb_cdc.data is None)
 
     def _init_apps(self):
-        self._app_a = StoreAndShowApp(self)
-        self._app_b = ZeAlterEgoApp(self)
+        # module and class of the app behind every button, imported and created on first start
+        self._apps['a'] = ('app_store_and_show', 'StoreAndShowApp')
+        self._apps['b'] = ('app_zealterego', 'ZeAlterEgoApp')
 
         if self.config["wifi.attached"]:
-            self._app_c = ZePassApp(self)
+            self._apps['c'] = ('app_zepass', 'ZePassApp')
         elif self.config['keyboard.attached']:
-            self._app_c = DeveloperIdleClickerApp(self)
+            self._apps['c'] = ('app_developer_idle_clicker', 'DeveloperIdleClickerApp')
         else:
-            self._app_c = DeveloperIdleClickerApp(self)
+            self._apps['c'] = ('app_developer_idle_clicker', 'DeveloperIdleClickerApp')
+
+        self._start_app(self._app('a'))
+
+    def _app(self, name):
+        app = self._app_instances.get(name)
+        if app is None:
+            module_name, class_name = self._apps[name]
+            module = __import__(module_name)
+            app = getattr(module, class_name)(self)
+            self._app_instances[name] = app
 
-        self._start_app(self._app_a)
+        return app
+
+    def _unload_apps(self):
+        # forget all apps not running and their modules, they get imported again on their next start.
+        for name in list(self._app_instances):
+            if self._app_instances[name] is not self.active_app:
+                del self._app_instances[name]
+                sys.modules.pop(self._apps[name][0], None)
+                self.messages.append(Message(MessageKey.INFO, f"Unloaded app {name}."))
+
+        gc.collect()
 
     def _start_app(self, app):
         if self.active_app == app:
@@ -217,73 +341,170 @@ class ZeBadgeOs:
         self.active_app = app
         self.active_app.run()
 
+        if hasattr(gc, 'mem_free'):
+            gc.collect()
+            if gc.mem_free() < self.config.get('os.apps.watermark', _APPS_WATERMARK):
+                self._unload_apps()
+
     def _check_system_keys(self, changed):
         if 'developer' in changed and not changed['developer']:
             self.messages.append(Message(ui.MessageKey.SHOW_TERMINAL))
         else:
             if 'a' in changed and not changed['a']:
-                app = self._app_a
+                app = 'a'
             elif 'b' in changed and not changed['b']:
-                app = self._app_b
+                app = 'b'
             elif 'c' in changed and not changed['c']:
-                app = self._app_c
+                app = 'c'
             else:
                 app = None
 
             if app:
-                self._start_app(app)
+                self._start_app(self._app(app))
 
     def _subscribe_to_system_buttons(self):
         self.subscribe(MessageKey.BUTTON_CHANGED, lambda os, message: self._check_system_keys(message.value))
 
 
+class Task:
+    # a function to be called by the os every interval seconds, or idle_interval seconds while not busy.
+
+    def __init__(self, function, interval: float = 0.0, name: str = None, idle_interval: float = None,
+                 ready=None):
+        self.function = function
+        self.interval = interval
+        self.idle_interval = interval if idle_interval is None else idle_interval
+        self.ready = ready
+        self.name = name or getattr(function, '__name__', str(function))
+        self.deadline = 0.0
+
+    def wake(self):
+        # run on the next pass of the main loop
+        self.deadline = 0.0
+
+    def __repr__(self):
+        return f"Task({self.name}, every {self.interval}s, {self.idle_interval}s idle)"
+
+
+class ButtonEventKind:
+    PRESSED = "pressed"
+    RELEASED = "released"
+    LONG_PRESSED = "long_pressed"
+    REPEATED = "repeated"
+
+
+class ButtonEvent:
+    # what happened to a button: kind, when (supervisor.ticks_ms) and how long it was held so far (ms)
+    __slots__ = ('button', 'kind', 'timestamp', 'duration')
+
+    def __init__(self, button: str, kind: str, timestamp: int, duration: int = 0):
+        self.button = button
+        self.kind = kind
+        self.timestamp = timestamp
+        self.duration = duration
+
+    def __str__(self):
+        return f"{self.button} {self.kind} after {self.duration}ms"
+
+
 class SystemButtons:
-    def __init__(self):
-        self.a = _system_button(board.SW_A)
-        self.b = _system_button(board.SW_B)
-        self.c = _system_button(board.SW_C)
-        self.up = _system_button(board.SW_UP)
-        self.down = _system_button(board.SW_DOWN)
-        self.developer = _system_button(board.USER_SW)
-        self.last = self.snapshot()
-
-    def snapshot(self):
-        return {
-            'a': self.a.value,
-            'b': self.b.value,
-            'c': self.c.value,
-            'up': self.up.value,
-            'down': self.down.value,
-            'developer': self.developer.value,
-        }
-
-    def changes(self):
-        result = {}
-        current = self.snapshot()
-
-        if current['a'] != self.last['a']: result['a'] = current['a']
-        if current['b'] != self.last['b']: result['b'] = current['b']
-        if current['c'] != self.last['c']: result['c'] = current['c']
-        if current['up'] != self.last['up']: result['up'] = current['up']
-        if current['down'] != self.last['down']: result['down'] = current['down']
-        if current['developer'] != self.last['developer']: result['developer'] = current['developer']
-
-        self.last = current
-        return result
-
-
-def _system_button(pin) -> DigitalInOut:
-    button = DigitalInOut(pin)
-    button.direction = Direction.INPUT
-    button.pull = Pull.DOWN
-    return button
+    # the buttons of the badge, scanned and debounced in the background by keypad.
+    #
+    # presses get queued between polls, so even short ones are not lost.
+
+    NAMES = ('a', 'b', 'c', 'up', 'down', 'developer')
+
+    def __init__(self, long_press: float = 0.6, repeat: float = 0.15):
+        self.keys = keypad.Keys(
+            (board.SW_A, board.SW_B, board.SW_C, board.SW_UP, board.SW_DOWN, board.USER_SW),
+            value_when_pressed=True,
+            pull=True,
+            interval=0.01,
+            max_events=32,
+        )
+        self.long_press = long_press
+        self.repeat = repeat
+
+        self._event = keypad.Event()
+        # per button: ticks_ms it got pressed (None if released), of the next long press or repeat
+        # and how many of those were sent already
+        self._pressed_at = [None] * len(self.NAMES)
+        self._next_hold = [0] * len(self.NAMES)
+        self._holds = [0] * len(self.NAMES)
+
+    def ready(self) -> bool:
+        # events waiting, keypad collects them in the background
+        return bool(self.keys.events)
+
+    def poll(self, messages) -> bool:
+        # append BUTTON_CHANGED and BUTTON_EVENT messages for everything since the last poll.
+        # returns whether buttons are in use: pressed since the last poll or still held.
+        event = self._event
+        changed = False
+        while self.keys.events.get_into(event):
+            changed = True
+            number = event.key_number
+            name = self.NAMES[number]
+            timestamp = event.timestamp
+
+            if event.pressed:
+                self._pressed_at[number] = timestamp
+                self._next_hold[number] = (timestamp + int(self.long_press * 1000)) & _TICKS_MAX
+                self._holds[number] = 0
+                button_event = ButtonEvent(name, ButtonEventKind.PRESSED, timestamp)
+            else:
+                pressed_at = self._pressed_at[number]
+                duration = _ticks_diff(timestamp, pressed_at) if pressed_at is not None else 0
+                self._pressed_at[number] = None
+                button_event = ButtonEvent(name, ButtonEventKind.RELEASED, timestamp, duration)
+
+            messages.append(obtain(MessageKey.BUTTON_CHANGED, {name: event.pressed}))
+            messages.append(obtain(MessageKey.BUTTON_EVENT, button_event))
+
+        return self._check_held(messages) or changed
+
+    def _check_held(self, messages) -> bool:
+        now = None
+        held = False
+        for number, pressed_at in enumerate(self._pressed_at):
+            if pressed_at is None:
+                continue
+
+            held = True
+            if now is None:
+                now = supervisor.ticks_ms()
+
+            if _ticks_diff(now, self._next_hold[number]) < 0:
+                continue
+
+            kind = ButtonEventKind.REPEATED if self._holds[number] else ButtonEventKind.LONG_PRESSED
+            self._holds[number] += 1
+            self._next_hold[number] = (now + int(self.repeat * 1000)) & _TICKS_MAX
+
+            duration = _ticks_diff(now, pressed_at)
+            messages.append(obtain(MessageKey.BUTTON_EVENT, ButtonEvent(self.NAMES[number], kind, now, duration)))
+
+        return held
+
+
+def _ticks_diff(later, earlier):
+    # supervisor.ticks_ms wraps around after 2**29 milliseconds
+    return ((later - earlier + _TICKS_HALF_PERIOD) & _TICKS_MAX) - _TICKS_HALF_PERIOD
 
 
 def _update_system_buttons(os):
-    changes = os.buttons.changes()
+    return os.buttons.poll(os.messages)
+
+
+def _subscriber_name(topic, subscriber_id, subscriber):
+    return f"{topic}:{getattr(subscriber, '__name__', 'subscriber')}#{subscriber_id}"
 
-    if len(changes) > 0:
-        os.messages.append(Message(MessageKey.BUTTON_CHANGED, changes))
+
+def _tick_handler(os, message):
+    print('.', end='')
+
+    os.led_on = not os.led_on
+    os.led.value = os.led_on
 
 
 def _error_handler(os, message):
@@ -316,6 +537,14 @@ def _serial_received_handler(os, message):
         SERIAL_COMMANDS[command](os, meta, payload)
 
 
+def _serial_binary_received_handler(os, message):
+    (command, meta, payload) = message.value
+    if command in SERIAL_BINARY_COMMANDS:
+        SERIAL_BINARY_COMMANDS[command](os, meta, payload)
+    else:
+        print(f"Command '{command}' takes no binary payload.")
+
+
 def _reload_command(os, meta, payload):
     os.messages.append(Message(MessageKey.RELOAD))
 
@@ -329,7 +558,7 @@ def _terminal_command(os, meta, payload):
 
 
 def _refresh_command(os, meta, payload):
-    os.messages.append(Message(ui.MessageKey.REFRESH))
+    os.messages.append(ui.REFRESH_MESSAGE)
 
 
 def _config_save_command(os, meta, payload):
@@ -349,18 +578,22 @@ def _config_list_command(os, meta, payload):
 
 
 def _show_command(os, filename, _):
-    _save_last_page(filename)
+    _save_last_page(ui.page_filename(filename))
     os.messages.append(Message(ui.MessageKey.SHOW_FILE, filename))
 
 
 def _store_command(os, filename, payload):
-    if not filename.endswith('.b64'):
-        filename += '.b64'
+    filename = ui.store_page(filename, payload)
+    del payload
 
     _save_last_page(filename)
 
-    with open(filename, "wb") as file:
-        file.write(payload)
+
+def _store_binary_command(os, filename, payload):
+    filename = ui.store_page(filename, payload, deflated=True)
+    del payload
+
+    _save_last_page(filename)
 
 
 def _save_last_page(filename):
@@ -374,6 +607,17 @@ def _preview_command(os, meta, payload):
     bitmap, palette = ui.decode_serialized_bitmap(payload)
     del payload
 
+    _preview(os, bitmap, palette)
+
+
+def _preview_binary_command(os, meta, payload):
+    bitmap, palette = ui.decode_serialized_bitmap(payload, deflated=True)
+    del payload
+
+    _preview(os, bitmap, palette)
+
+
+def _preview(os, bitmap, palette):
     os.messages.append(Message(MessageKey.INFO, 'previewing image'))
     os.messages.append(Message(ui.MessageKey.SHOW_BITMAP, (bitmap, palette)))
 
@@ -386,13 +630,8 @@ def _list_command(os, meta, payload):
 
 
 def _delete_command(os, filename, _):
-    if not filename.endswith('.b64'):
-        filename += '.b64'
-
-    files = os.get_stored_files()
-    if filename in files:
+    if ui.delete_page(filename):
         os.messages.append(Message(MessageKey.INFO, f"Deleted file: '{filename}'."))
-        systemos.remove(filename)
 
 
 def _help_command(os, meta, payload):
@@ -401,13 +640,48 @@ def _help_command(os, meta, payload):
     os.messages.append(Message(serial.MessageKey.RESPOND, message))
 
 
+def _stats_command(os, meta, payload):
+    if meta == 'on' and not os.stats:
+        os.stats = Stats()
+    elif meta == 'off':
+        os.stats = None
+
+    if os.stats:
+        message = os.stats.report()
+    else:
+        message = "Stats are off, turn them on with 'stats:on:'."
+
+    message += "\n" + ui.refresh_report()
+    message += "\n" + os.boot_report()
+    if hasattr(gc, 'mem_free'):
+        message += f", {gc.mem_free()} bytes free now"
+
+    os.messages.append(Message(MessageKey.INFO, message))
+    os.messages.append(Message(serial.MessageKey.RESPOND, message))
+
+
+def _stats_reset_command(os, meta, payload):
+    if os.stats:
+        os.stats.reset()
+        os.messages.append(Message(MessageKey.INFO, "Stats reset."))
+
+
+def _capabilities_command(os, meta, payload):
+    message = ','.join(serial.CAPABILITIES)
+    os.messages.append(Message(MessageKey.INFO, f"Capabilities: {message}"))
+    os.messages.append(Message(serial.MessageKey.RESPOND, message))
+
+
 SERIAL_COMMANDS = {
     "help": _help_command,
+    "capabilities": _capabilities_command,
 
     "reload": _reload_command,
     "exit": _exit_command,
     "terminal": _terminal_command,
     "refresh": _refresh_command,
+    "stats": _stats_command,
+    "stats_reset": _stats_reset_command,
 
     "config_save": _config_save_command,
     "config_load": _config_load_command,
@@ -420,3 +694,9 @@ SERIAL_COMMANDS = {
     "list": _list_command,
     "delete": _delete_command,
 }
+
+# commands taking the raw bytes of a binary upload, the zlib compressed image without base64
+SERIAL_BINARY_COMMANDS = {
+    "store": _store_binary_command,
+    "preview": _preview_binary_command,
+}
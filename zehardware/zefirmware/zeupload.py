@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#
+# Upload a (big) command to a connected badge: as raw bytes if the badge supports it, in frames
+# otherwise, and as plain text to badges knowing neither.
+#
+# usage: ./zeupload.py /dev/ttyACM1 store milos-exposed ./milos-exposed.b64
+#
+import base64
+import os
+import sys
+import time
+
+import serial
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import frames
+
+# commands whose base64 payload can be sent decoded in a binary upload
+BINARY_COMMANDS = ('store', 'preview')
+
+
+def capabilities(connection, timeout: float = 1.0) -> list:
+    connection.reset_input_buffer()
+    connection.write(b'capabilities::')
+
+    response = b''
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response += connection.read(connection.in_waiting or 1)
+        if b'binary' in response or b'frames' in response:
+            # let the rest of the answer arrive
+            time.sleep(0.1)
+            response += connection.read(connection.in_waiting)
+            break
+
+    # older badges don't know the command, they only understand text and maybe frames
+    return response.decode(errors='ignore').strip().split(',') if response else ['text']
+
+
+def upload(port: str, command: str, meta: str, payload: bytes) -> bool:
+    with serial.Serial(port, baudrate=115200, timeout=0.05) as connection:
+        supported = capabilities(connection)
+        if command in BINARY_COMMANDS and 'binary' in supported:
+            raw = base64.b64decode(payload)
+            if len(raw) <= frames.MAX_BINARY_PAYLOAD:
+                connection.write(frames.encode_binary(command, meta, raw))
+                connection.flush()
+
+                answer = frames.wait_for_answer(lambda: connection.read(connection.in_waiting or 1), timeout=2.0)
+                if answer == frames.Kind.ACK:
+                    print(f"Uploaded {len(raw)} raw bytes instead of {len(payload)} base64 bytes.")
+                    return True
+
+                print(f"Could not upload {len(raw)} raw bytes: {'broken' if answer else 'no answer'}.")
+                return False
+
+        if 'frames' not in supported:
+            connection.write(command.encode() + b':' + meta.encode() + b':' + payload)
+            connection.flush()
+            print(f"Uploaded {len(payload)} bytes as text.")
+            return True
+
+        sender = frames.Sender(
+            write=connection.write,
+            read=lambda: connection.read(connection.in_waiting or 1),
+        )
+
+        success = sender.send(command, meta, payload)
+        print(f"{'Uploaded' if success else 'Could not upload'} {len(payload)} bytes in {sender.sent_frames} frames.")
+        return success
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 5:
+        print(f"Usage:\n\t{sys.argv[0]} <serial port> <command> <meta> <payload file>")
+        sys.exit(1)
+
+    port, command, meta, payload_file = sys.argv[1:]
+    with open(payload_file, 'rb') as file:
+        content = file.read().strip()
+
+    sys.exit(0 if upload(port, command, meta, content) else 1)